@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # custom apps
     'core.apps.CoreConfig',
     'user.apps.UserConfig',
@@ -150,7 +151,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/static/'
-MEDIA_URL = 'static/media/'
+# the media files are sent by recipe.views.RecipeMediaView, only to the
+# users owning them
+MEDIA_URL = 'api/recipe/media/'
 
 # $ python manage.py collectstatic
 # This will copy all files from your static folders into the STATIC_ROOT 
@@ -159,6 +162,74 @@ MEDIA_URL = 'static/media/'
 STATIC_ROOT = '/vol/web/media'
 MEDIA_ROOT = '/vol/web/static'
 
+# internal location of the proxy serving MEDIA_ROOT, when set the media
+# files are sent by the proxy (X-Accel-Redirect) instead of the
+# application, see proxy/default.conf.tpl
+MEDIA_X_ACCEL_PREFIX = os.environ.get('MEDIA_X_ACCEL_PREFIX', '')
+
+# cache used for the API responses, the default local memory cache is safe
+# to use with many processes since the cached responses are versioned in
+# the database (see recipe.caching)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# how long (in seconds) the list responses are kept in the cache
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+# the most recipes that can be created with one request
+RECIPE_BULK_CREATE_MAX = int(os.environ.get('RECIPE_BULK_CREATE_MAX', 1000))
+
+# how many recipes the export reads from the database at once
+RECIPE_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 2000)
+)
+
+# the longest side (in pixels) and the formats of the resized copies
+# generated for every uploaded recipe image
+RECIPE_IMAGE_RENDITION_SIZES = [128, 512, 1024]
+RECIPE_IMAGE_RENDITION_FORMATS = ['webp', 'jpeg']
+
+# threads generating the renditions in the background, with 0 they are
+# generated in the request itself
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# the longer side of the placeholders embedded in the recipe list, in
+# pixels, stored as a data URI of around 1 KB or less
+RECIPE_IMAGE_PLACEHOLDER_SIZE = 16
+
+# limits of the uploaded recipe images, checked from the image header
+# before the image is decoded (the proxy accepts bodies up to 10M)
+RECIPE_IMAGE_MAX_UPLOAD_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP']
+
+# store the recipe images under the hash of their content, an image
+# uploaded many times is stored only once (see core.storage)
+RECIPE_IMAGE_CONTENT_ADDRESSED = bool(
+    int(os.environ.get('RECIPE_IMAGE_CONTENT_ADDRESSED', 0))
+)
+
+# image files younger than this (in seconds) are never deleted as
+# unused, the transaction of their upload can still be running
+MEDIA_CLEANUP_MIN_AGE = int(os.environ.get('MEDIA_CLEANUP_MIN_AGE', 3600))
+
+# the widths the recipe images can be resized to on demand, the resized
+# images are kept in a directory under MEDIA_ROOT up to the size limit,
+# the least recently used are deleted first
+RECIPE_IMAGE_RESIZE_WIDTHS = [64, 128, 256, 320, 480, 640, 768, 1024, 1280,
+                              1600, 2048]
+RECIPE_IMAGE_CACHE_DIR = 'cache/resized'
+RECIPE_IMAGE_CACHE_MAX_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
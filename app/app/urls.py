@@ -15,8 +15,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from core import views as core_views
-from django.conf.urls.static import static
-from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import (
@@ -47,8 +45,5 @@ urlpatterns = [
     path('api/recipe/', include('recipe.urls')),
 ]
 
-if settings.DEBUG:
-    # we are mimiking the bahvaiour of serving media files
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT,
-    )
+# the media files are served by the recipe app (api/recipe/media/), only
+# to their owners, also in development
@@ -0,0 +1,81 @@
+"""
+Deletion of the image files no recipe uses anymore.
+"""
+import os
+import time
+
+from core.models import ImageBlob, Recipe, RenditionNames
+from core.storage import BLOB_PREFIX
+from django.conf import settings
+from django.db import transaction
+
+
+def referenced_names(names):
+    """Return the names of the given files used by a recipe, as the
+    image or as one of its renditions.
+
+    The uses of the shared files (content addressed) are counted by the
+    database, the other files are looked up (two index lookups).
+    """
+    names = set(names)
+    blobs = {name for name in names if name.startswith(BLOB_PREFIX)}
+    names -= blobs
+    referenced = set()
+    if blobs:
+        referenced.update(ImageBlob.objects.filter(
+            name__in=blobs, ref_count__gt=0,
+        ).values_list('name', flat=True))
+    if not names:
+        return referenced
+    referenced.update(
+        Recipe.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    renditions = Recipe.objects.alias(
+        rendition_names=RenditionNames('image_renditions'),
+    ).filter(
+        rendition_names__has_any_keys=list(names),
+    ).values_list('image_renditions', flat=True)
+    for recipe_renditions in renditions:
+        referenced.update(
+            name for name in recipe_renditions.values() if name in names
+        )
+    return referenced
+
+
+def delete_unreferenced(names, min_age=0):
+    """Delete the files not used by any recipe, return the deleted names
+    and their size.
+
+    Files modified in the last min_age seconds are kept, they can belong
+    to an upload whose transaction did not commit yet. The shared files
+    (content addressed) always get at least MEDIA_CLEANUP_MIN_AGE, an
+    upload can reuse one of them at any time.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    now = time.time()
+    deleted, size = [], 0
+    names = {name for name in names if name}
+    for name in sorted(names - referenced_names(names)):
+        age = min_age
+        if name.startswith(BLOB_PREFIX):
+            age = max(age, settings.MEDIA_CLEANUP_MIN_AGE)
+        try:
+            stat = os.stat(storage.path(name))
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime < age:
+            continue
+        storage.delete(name)
+        deleted.append(name)
+        size += stat.st_size
+    # the counts of the deleted shared files are 0, their rows go too
+    ImageBlob.objects.filter(name__in=deleted, ref_count=0).delete()
+    return deleted, size
+
+
+def delete_when_unused(names):
+    """Delete the files after the transaction commits, unless a recipe
+    still uses them by then."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: delete_unreferenced(names))
@@ -0,0 +1,85 @@
+"""
+Django command to delete the image files no recipe uses anymore.
+"""
+import os
+from itertools import islice
+
+from core.cleanup import delete_unreferenced, referenced_names
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from typing import Any
+
+
+# only the uploads are checked, the cache of the resized images has its
+# own size limit
+UPLOADS_DIR = 'uploads'
+
+
+def walk_files(root, directory):
+    """Yield the names (relative to root) of the files in the directory
+    and its subdirectories, one by one."""
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root)
+
+
+class Command(BaseCommand):
+    """Django command to delete the unused image files."""
+    help = (
+        "Delete the image files under MEDIA_ROOT/uploads that are not the "
+        "image or a rendition of any recipe, like the files of replaced "
+        "images and of recipes deleted in bulk. The directory is read "
+        "lazily and the files are checked against the database in batches, "
+        "so any number of files can be handled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Files checked against the database at once.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_CLEANUP_MIN_AGE,
+            help='Only delete files older than this, in seconds.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the unused files.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        root = settings.MEDIA_ROOT
+        directory = os.path.join(root, UPLOADS_DIR)
+        if not os.path.isdir(directory):
+            self.stdout.write(f'{directory} does not exist.')
+            return
+
+        files = walk_files(root, directory)
+        checked = unused = deleted = freed = 0
+        while batch := list(islice(files, options['batch_size'])):
+            checked += len(batch)
+            if options['dry_run']:
+                names = set(batch) - referenced_names(batch)
+                unused += len(names)
+                for name in sorted(names):
+                    self.stdout.write(name)
+                continue
+            names, size = delete_unreferenced(batch, options['min_age'])
+            deleted += len(names)
+            freed += size
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {checked} files, {unused} are unused.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} files, deleted {deleted} ({freed} bytes).'
+        ))
@@ -0,0 +1,265 @@
+"""
+Django command to import recipes from NDJSON or CSV files.
+"""
+import csv
+import io
+import json
+import time
+from collections import deque
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from core.models import Recipe, RecipeImport
+from core.signals import user_data_changed
+
+from typing import Any
+
+
+# separator of the tag and ingredient names in the CSV files
+CSV_LIST_SEPARATOR = '|'
+
+# the staging tables only live for the transaction of one batch
+STAGING_TABLES_SQL = """
+DROP TABLE IF EXISTS import_recipe, import_tag, import_ingredient;
+CREATE TEMPORARY TABLE import_recipe (
+    record bigint PRIMARY KEY,
+    id bigint,
+    title varchar(255) NOT NULL,
+    description text NOT NULL,
+    time_minutes integer NOT NULL,
+    price numeric(5, 2) NOT NULL,
+    link varchar(255) NOT NULL
+) ON COMMIT DROP;
+CREATE TEMPORARY TABLE import_tag (
+    record bigint NOT NULL,
+    name varchar(255) NOT NULL
+) ON COMMIT DROP;
+CREATE TEMPORARY TABLE import_ingredient (LIKE import_tag) ON COMMIT DROP;
+"""
+
+# set based merge of the staging tables into the recipe tables
+MERGE_SQL = [
+    # the ids of the new recipes are taken up front, so the links to the
+    # tags and ingredients can refer to them
+    "UPDATE import_recipe "
+    "SET id = nextval(pg_get_serial_sequence('core_recipe', 'id'))",
+    "INSERT INTO core_recipe "
+    "(id, user_id, title, description, time_minutes, price, link, "
+    "image_renditions, image_placeholder, image_renditions_failed, "
+    "updated_at) "
+    "SELECT id, %(user_id)s, title, description, time_minutes, price, "
+    "link, '{}', '', false, now() FROM import_recipe",
+] + [
+    sql.format(name=name, related=related)
+    for name, related in (('tag', 'tags'), ('ingredient', 'ingredients'))
+    for sql in (
+        # only the names the user does not have yet, the links inserted
+        # next count their recipes
+        "INSERT INTO core_{name} (user_id, name, recipe_count) "
+        "SELECT DISTINCT %(user_id)s, name, 0 FROM import_{name} "
+        "ON CONFLICT (user_id, name) DO NOTHING",
+        "INSERT INTO core_recipe_{related} (recipe_id, {name}_id) "
+        "SELECT DISTINCT recipe.id, related.id FROM import_{name} staged "
+        "JOIN import_recipe recipe ON recipe.record = staged.record "
+        "JOIN core_{name} related ON related.user_id = %(user_id)s "
+        "AND related.name = staged.name "
+        "ON CONFLICT DO NOTHING",
+    )
+]
+
+
+class Command(BaseCommand):
+    """Django command to import recipes."""
+    help = (
+        "Import the recipes of a user from a NDJSON file (one recipe per "
+        "line, like the export) or a CSV file (title, time_minutes, price, "
+        "link, description, tags and ingredients separated by '|'). The "
+        "recipes are loaded in batches with COPY, an interrupted import "
+        "resumes after the last imported batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument(
+            '--user', required=True,
+            help='Email of the user the recipes are imported for.',
+        )
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'],
+            help='Format of the file, by default from its extension.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Recipes imported in one transaction.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Import the file from the beginning again.',
+        )
+
+    def _read_records(self, path, file_format):
+        """Yield the records of the file one by one."""
+        with open(path, newline='', encoding='utf-8') as file:
+            if file_format == 'csv':
+                for row in csv.DictReader(file):
+                    for field_name in ('tags', 'ingredients'):
+                        row[field_name] = [
+                            name for name in (
+                                row.get(field_name) or ''
+                            ).split(CSV_LIST_SEPARATOR) if name
+                        ]
+                    yield row
+                return
+
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f'Line {number} is not JSON: {error}')
+
+    def _names(self, items):
+        """Return the names of the tags/ingredients of a record."""
+        names = []
+        for item in items or []:
+            # the export writes {"id": ..., "name": ...}
+            name = item['name'] if isinstance(item, dict) else item
+            name = str(name).strip()
+            if len(name) > 255:
+                raise ValueError(f'name longer than 255 characters: {name}')
+            if name:
+                names.append(name)
+        return names
+
+    def _clean(self, number, record):
+        """Return the staging rows of a record."""
+        try:
+            title = str(record['title']).strip()
+            description = str(record.get('description') or '')
+            link = str(record.get('link') or '')
+            time_minutes = int(record['time_minutes'])
+            price = Decimal(str(record['price'])).quantize(Decimal('0.01'))
+            if not title or len(title) > 255:
+                raise ValueError('title is empty or too long')
+            # numeric(5, 2)
+            if abs(price) >= 1000:
+                raise ValueError(f'price out of range: {price}')
+            # the validators of the model fields, the URL and the length
+            # of the link and the integer range of time_minutes, so a bad
+            # value stops the import here and not in the middle of COPY
+            for field_name, value in (
+                ('link', link), ('time_minutes', time_minutes),
+            ):
+                Recipe._meta.get_field(field_name).run_validators(value)
+            tags = self._names(record.get('tags'))
+            ingredients = self._names(record.get('ingredients'))
+        except (
+            KeyError, TypeError, ValueError, InvalidOperation,
+            ValidationError,
+        ) as error:
+            raise CommandError(f'Record {number} is invalid: {error!r}')
+
+        recipe = (number, title, description, time_minutes, price, link)
+        return recipe, tags, ingredients
+
+    def _copy(self, cursor, table, rows):
+        """Load the rows into the staging table with COPY."""
+        buffer = io.StringIO()
+        # all quoted, an unquoted empty value would be NULL
+        csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {table} FROM STDIN WITH (FORMAT csv)', buffer,
+        )
+
+    def _import_batch(self, user, batch):
+        """Import one batch of numbered records."""
+        recipes, tags, ingredients = [], [], []
+        for number, record in batch:
+            recipe, tag_names, ingredient_names = self._clean(number, record)
+            recipes.append(recipe)
+            tags.extend((number, name) for name in tag_names)
+            ingredients.extend((number, name) for name in ingredient_names)
+
+        with connection.cursor() as cursor:
+            cursor.execute(STAGING_TABLES_SQL)
+            self._copy(
+                cursor,
+                'import_recipe '
+                '(record, title, description, time_minutes, price, link)',
+                recipes,
+            )
+            self._copy(cursor, 'import_tag (record, name)', tags)
+            self._copy(cursor, 'import_ingredient (record, name)', ingredients)
+            for sql in MERGE_SQL:
+                cursor.execute(sql, {'user_id': user.pk})
+
+        # nothing sends signals here, so the derived data is refreshed
+        # for the whole batch at once
+        Recipe.objects.filter(
+            pk__in=RawSQL('SELECT id FROM import_recipe', []),
+        ).update_search_vector()
+        user_data_changed(user.pk)
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        path = Path(options['path']).resolve()
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist.')
+        file_format = options['format'] or (
+            'csv' if path.suffix.lower() == '.csv' else 'ndjson'
+        )
+        user = get_user_model().objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f'User {options["user"]} does not exist.')
+
+        progress, _ = RecipeImport.objects.get_or_create(
+            user=user,
+            source=str(path),
+        )
+        if options['restart']:
+            progress.records_done = 0
+            progress.finished = False
+        elif progress.finished:
+            self.stdout.write(f'{path} was already imported.')
+            return
+        elif progress.records_done:
+            self.stdout.write(
+                f'Resuming after record {progress.records_done}.'
+            )
+
+        records = enumerate(self._read_records(path, file_format), start=1)
+        # skipping the records imported before
+        deque(islice(records, progress.records_done), maxlen=0)
+
+        imported = 0
+        start = time.perf_counter()
+        while batch := list(islice(records, options['batch_size'])):
+            # the batch and the progress are committed together, so an
+            # interrupted import continues right after the last batch
+            with transaction.atomic():
+                self._import_batch(user, batch)
+                progress.records_done = batch[-1][0]
+                progress.save()
+            imported += len(batch)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{progress.records_done} records imported '
+                f'({imported / elapsed:.0f} rows/s)'
+            )
+
+        progress.finished = True
+        progress.save()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes in {elapsed:.1f}s '
+            f'({imported / max(elapsed, 1e-9):.0f} rows/s).'
+        ))
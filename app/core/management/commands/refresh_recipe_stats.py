@@ -0,0 +1,36 @@
+"""
+Django command to refresh the recipe statistics.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import IngredientStats, TagStats, UserRecipeStats
+
+from typing import Any
+
+
+class Command(BaseCommand):
+    """Django command to refresh the recipe statistics."""
+    help = (
+        "Refresh the materialized views behind the recipe statistics "
+        "endpoint. They are refreshed concurrently, so the endpoint keeps "
+        "answering from the previous data meanwhile. Meant to be run "
+        "periodically, the jobs service of the deployment (scripts/jobs.sh) "
+        "runs it every RECIPE_STATS_REFRESH_SECONDS."
+    )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        with connection.cursor() as cursor:
+            for model in (UserRecipeStats, TagStats, IngredientStats):
+                start = time.perf_counter()
+                cursor.execute(
+                    'REFRESH MATERIALIZED VIEW CONCURRENTLY '
+                    f'{connection.ops.quote_name(model._meta.db_table)}'
+                )
+                self.stdout.write(
+                    f'{model._meta.db_table} refreshed in '
+                    f'{time.perf_counter() - start:.2f}s'
+                )
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name'], name='ingredient_user_name_desc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name'], name='tag_user_name_desc_idx'),
+        ),
+        # the auto created m2m tables only have the unique
+        # (recipe_id, tag_id) index for lookups starting from the recipe,
+        # these cover the reverse lookups (recipes of given tags) with an
+        # index only scan
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS recipe_tags_tag_recipe_idx ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS recipe_ingredients_ingr_recipe_idx ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS recipe_ingredients_ingr_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+# same weights as RecipeQuerySet.update_search_vector, for the recipes
+# created before the search vector existed
+BACKFILL_SEARCH_VECTOR = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('english', COALESCE(title, '')), 'A')
+    || setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    || setweight(to_tsvector('english', COALESCE((
+        SELECT string_agg(core_tag.name, ' ')
+        FROM core_recipe_tags
+        INNER JOIN core_tag ON core_tag.id = core_recipe_tags.tag_id
+        WHERE core_recipe_tags.recipe_id = core_recipe.id
+    ), '')), 'C')
+    || setweight(to_tsvector('english', COALESCE((
+        SELECT string_agg(core_ingredient.name, ' ')
+        FROM core_recipe_ingredients
+        INNER JOIN core_ingredient
+            ON core_ingredient.id = core_recipe_ingredients.ingredient_id
+        WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+    ), '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_recipe_tag_ingredient_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=BACKFILL_SEARCH_VECTOR,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
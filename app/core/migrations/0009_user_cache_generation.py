@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_tag_ingredient_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='cache_generation',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='cache generation'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:41
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+def merge_duplicates_sql(table, through, column):
+    """Return the statements merging the duplicated names of a user into
+    the oldest row, the recipes are linked to that row instead."""
+    duplicates = (
+        f'SELECT id, MIN(id) OVER (PARTITION BY user_id, name) AS keeper '
+        f'FROM {table}'
+    )
+    # every statement can be run again, if the migration gets interrupted
+    return [
+        f'INSERT INTO {through} (recipe_id, {column}) '
+        f'SELECT link.recipe_id, dup.keeper FROM {through} link '
+        f'JOIN ({duplicates}) dup ON dup.id = link.{column} '
+        f'WHERE dup.id <> dup.keeper ON CONFLICT DO NOTHING',
+        f'DELETE FROM {through} link USING ({duplicates}) dup '
+        f'WHERE dup.id = link.{column} AND dup.id <> dup.keeper',
+        f'DELETE FROM {table} USING ({duplicates}) dup '
+        f'WHERE dup.id = {table}.id AND dup.id <> dup.keeper',
+    ]
+
+
+def drop_invalid_index(name):
+    """Return the operation dropping the index when it is invalid.
+
+    A failed CREATE INDEX CONCURRENTLY (a duplicate inserted while it ran)
+    leaves an invalid index behind, IF NOT EXISTS would then skip building
+    it again and the constraint could not use it.
+    """
+    def drop(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_index JOIN pg_class '
+                'ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+                [name],
+            )
+            if cursor.fetchone():
+                cursor.execute(f'DROP INDEX CONCURRENTLY {name}')
+
+    return migrations.RunPython(drop, migrations.RunPython.noop)
+
+
+def add_unique_constraint(table, name):
+    """Return the operation adding the unique (user, name) constraint
+    without locking the table for writes while the index is built."""
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[
+            drop_invalid_index(name),
+            migrations.RunSQL(
+                f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON {table} (user_id, name)',
+                reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS {name}',
+            ),
+            # skipped when an earlier run already added it
+            migrations.RunSQL(
+                f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_constraint "
+                f"WHERE conname = '{name}') THEN "
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+                f'UNIQUE USING INDEX {name}; END IF; END $$',
+                reverse_sql=f'ALTER TABLE {table} DROP CONSTRAINT {name}',
+            ),
+        ],
+        state_operations=[
+            migrations.AddConstraint(
+                model_name=table.removeprefix('core_'),
+                constraint=models.UniqueConstraint(fields=('user', 'name'), name=name),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            merge_duplicates_sql('core_tag', 'core_recipe_tags', 'tag_id'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            merge_duplicates_sql(
+                'core_ingredient', 'core_recipe_ingredients', 'ingredient_id',
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        add_unique_constraint('core_tag', 'tag_user_name_unique'),
+        add_unique_constraint('core_ingredient', 'ingredient_user_name_unique'),
+        # the unique index on (user_id, name) serves the sorted lists
+        RemoveIndexConcurrently(
+            model_name='ingredient',
+            name='ingredient_user_name_desc_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='tag',
+            name='tag_user_name_desc_idx',
+        ),
+    ]
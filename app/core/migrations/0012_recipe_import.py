@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_tag_ingredient_user_name_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=1024, verbose_name='source')),
+                ('records_done', models.PositiveBigIntegerField(default=0, verbose_name='records done')),
+                ('finished', models.BooleanField(default=False, verbose_name='finished')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimport',
+            constraint=models.UniqueConstraint(fields=('user', 'source'), name='recipe_import_user_source_unique'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def attr_stats_sql(name, related):
+    """Return the SQL of the view counting the recipes of each tag or
+    ingredient."""
+    return f"""
+    CREATE MATERIALIZED VIEW core_{name}_stats AS
+    SELECT item.id AS {name}_id, item.user_id, item.name,
+           count(link.recipe_id) AS recipe_count
+    FROM core_{name} item
+    LEFT JOIN core_recipe_{related} link ON link.{name}_id = item.id
+    GROUP BY item.id;
+    -- a unique index is needed to refresh the view concurrently
+    CREATE UNIQUE INDEX core_{name}_stats_pk_idx
+        ON core_{name}_stats ({name}_id);
+    -- the most used ones of a user are read from the index
+    CREATE INDEX core_{name}_stats_user_count_idx
+        ON core_{name}_stats (user_id, recipe_count DESC, {name}_id);
+    """
+
+
+USER_STATS_SQL = """
+CREATE MATERIALIZED VIEW core_user_recipe_stats AS
+SELECT user_id,
+       count(*) AS recipe_count,
+       avg(time_minutes)::float8 AS avg_time_minutes,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY time_minutes)
+           AS median_time_minutes,
+       round(avg(price), 2)::numeric(7, 2) AS avg_price,
+       (percentile_cont(0.5) WITHIN GROUP (ORDER BY price::float8))
+           ::numeric(7, 2) AS median_price,
+       now() AS refreshed_at
+FROM core_recipe
+GROUP BY user_id;
+CREATE UNIQUE INDEX core_user_recipe_stats_pk_idx
+    ON core_user_recipe_stats (user_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_import'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            USER_STATS_SQL,
+            reverse_sql='DROP MATERIALIZED VIEW core_user_recipe_stats',
+        ),
+        migrations.RunSQL(
+            attr_stats_sql('tag', 'tags'),
+            reverse_sql='DROP MATERIALIZED VIEW core_tag_stats',
+        ),
+        migrations.RunSQL(
+            attr_stats_sql('ingredient', 'ingredients'),
+            reverse_sql='DROP MATERIALIZED VIEW core_ingredient_stats',
+        ),
+        migrations.CreateModel(
+            name='IngredientStats',
+            fields=[
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('recipe_count', models.PositiveIntegerField(verbose_name='recipe count')),
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='core.ingredient', verbose_name='ingredient')),
+            ],
+            options={
+                'db_table': 'core_ingredient_stats',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('recipe_count', models.PositiveIntegerField(verbose_name='recipe count')),
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='core.tag', verbose_name='tag')),
+            ],
+            options={
+                'db_table': 'core_tag_stats',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('recipe_count', models.PositiveIntegerField(verbose_name='recipe count')),
+                ('avg_time_minutes', models.FloatField(null=True, verbose_name='average time')),
+                ('median_time_minutes', models.FloatField(null=True, verbose_name='median time')),
+                ('avg_price', models.DecimalField(decimal_places=2, max_digits=7, null=True, verbose_name='average price')),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=7, null=True, verbose_name='median price')),
+                ('refreshed_at', models.DateTimeField(verbose_name='refreshed at')),
+            ],
+            options={
+                'db_table': 'core_user_recipe_stats',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:50
+
+from django.db import migrations, models
+
+
+def recipe_count_triggers_sql(name, related):
+    """Return the SQL of the triggers keeping recipe_count of the tags or
+    ingredients up to date, and of the backfill of the counts."""
+    # statement level triggers with transition tables, so a batch of
+    # links (add(), set(), bulk inserts, COPY) is one grouped update, the
+    # increments are relative so concurrent transactions add up correctly
+    return f"""
+    CREATE FUNCTION core_{name}_recipe_count_add() RETURNS trigger AS $$
+    BEGIN
+        UPDATE core_{name} item
+        SET recipe_count = item.recipe_count + changed.links
+        FROM (
+            SELECT {name}_id, count(*) AS links FROM new_links
+            GROUP BY {name}_id ORDER BY {name}_id
+        ) changed
+        WHERE item.id = changed.{name}_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE FUNCTION core_{name}_recipe_count_remove() RETURNS trigger AS $$
+    BEGIN
+        UPDATE core_{name} item
+        SET recipe_count = item.recipe_count - changed.links
+        FROM (
+            SELECT {name}_id, count(*) AS links FROM old_links
+            GROUP BY {name}_id ORDER BY {name}_id
+        ) changed
+        WHERE item.id = changed.{name}_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER core_recipe_{related}_count_insert
+        AFTER INSERT ON core_recipe_{related}
+        REFERENCING NEW TABLE AS new_links
+        FOR EACH STATEMENT EXECUTE FUNCTION core_{name}_recipe_count_add();
+
+    CREATE TRIGGER core_recipe_{related}_count_delete
+        AFTER DELETE ON core_recipe_{related}
+        REFERENCING OLD TABLE AS old_links
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION core_{name}_recipe_count_remove();
+
+    -- the triggers lock the through table until the migration commits,
+    -- so no link can change between them and the backfill
+    UPDATE core_{name} item SET recipe_count = counted.links
+    FROM (
+        SELECT {name}_id, count(*) AS links FROM core_recipe_{related}
+        GROUP BY {name}_id
+    ) counted
+    WHERE item.id = counted.{name}_id;
+    """
+
+
+def drop_recipe_count_triggers_sql(name, related):
+    """Return the SQL removing the triggers."""
+    return f"""
+    DROP TRIGGER core_recipe_{related}_count_insert ON core_recipe_{related};
+    DROP TRIGGER core_recipe_{related}_count_delete ON core_recipe_{related};
+    DROP FUNCTION core_{name}_recipe_count_add();
+    DROP FUNCTION core_{name}_recipe_count_remove();
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_stats_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='recipe count'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='recipe count'),
+        ),
+        migrations.RunSQL(
+            recipe_count_triggers_sql('tag', 'tags'),
+            reverse_sql=drop_recipe_count_triggers_sql('tag', 'tags'),
+        ),
+        migrations.RunSQL(
+            recipe_count_triggers_sql('ingredient', 'ingredients'),
+            reverse_sql=drop_recipe_count_triggers_sql(
+                'ingredient', 'ingredients',
+            ),
+        ),
+    ]
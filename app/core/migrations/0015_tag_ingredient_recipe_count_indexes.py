@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:51
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_tag_ingredient_recipe_count'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count'], name='tag_user_count_idx'),
+        ),
+    ]
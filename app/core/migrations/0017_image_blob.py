@@ -0,0 +1,83 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:07
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+# keep ref_count of the blobs in step with the recipes using them, also
+# for the deletes and updates that never send signals (bulk actions)
+IMAGE_BLOB_TRIGGERS_SQL = """
+CREATE FUNCTION core_recipe_image_blob_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.image LIKE 'uploads/recipe/blobs/%' THEN
+        UPDATE core_imageblob
+        SET ref_count = ref_count - 1, updated_at = now()
+        WHERE name = OLD.image;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.image LIKE 'uploads/recipe/blobs/%' THEN
+        INSERT INTO core_imageblob (name, ref_count, updated_at)
+        VALUES (NEW.image, 1, now())
+        ON CONFLICT (name) DO UPDATE
+        SET ref_count = core_imageblob.ref_count + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_image_blob_insert
+    AFTER INSERT ON core_recipe
+    FOR EACH ROW WHEN (NEW.image LIKE 'uploads/recipe/blobs/%')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+-- only when the image changed, the recipes are updated often otherwise
+CREATE TRIGGER core_recipe_image_blob_update
+    AFTER UPDATE OF image ON core_recipe
+    FOR EACH ROW WHEN (OLD.image IS DISTINCT FROM NEW.image)
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+CREATE TRIGGER core_recipe_image_blob_delete
+    AFTER DELETE ON core_recipe
+    FOR EACH ROW WHEN (OLD.image LIKE 'uploads/recipe/blobs/%')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+INSERT INTO core_imageblob (name, ref_count, updated_at)
+SELECT image, count(*), now() FROM core_recipe
+WHERE image LIKE 'uploads/recipe/blobs/%'
+GROUP BY image;
+"""
+
+DROP_IMAGE_BLOB_TRIGGERS_SQL = """
+DROP TRIGGER core_recipe_image_blob_insert ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_update ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_delete ON core_recipe;
+DROP FUNCTION core_recipe_image_blob_refs();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='name')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='references')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.RecipeImageStorage(), upload_to=core.models.recipe_image_file_path, verbose_name='Image'),
+        ),
+        migrations.RunSQL(
+            IMAGE_BLOB_TRIGGERS_SQL,
+            reverse_sql=DROP_IMAGE_BLOB_TRIGGERS_SQL,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_recipe_media_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_placeholder',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='image placeholder'),
+        ),
+    ]
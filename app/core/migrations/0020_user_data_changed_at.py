@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:30
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # DROP INDEX CONCURRENTLY cannot run inside a transaction, the list no
+    # longer aggregates updated_at, the users get no Last-Modified until
+    # their data changes again
+    atomic = False
+
+    dependencies = [
+        ('core', '0019_recipe_image_placeholder'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='recipe',
+            name='recipe_user_updated_at_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='data_changed_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='data changed at'),
+        ),
+    ]
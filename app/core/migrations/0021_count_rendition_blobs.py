@@ -0,0 +1,151 @@
+from django.db import migrations
+
+
+# the renditions are stored as shared files too (content addressed), the
+# blobs count every use of a file by a recipe, as the image or as one of
+# its renditions, so the cleanup can trust the counts
+RENDITION_BLOB_TRIGGERS_SQL = """
+-- the writes of the recipes are blocked until the counts are rebuilt
+LOCK TABLE core_recipe IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE FUNCTION core_recipe_blob_names(image text, renditions jsonb)
+RETURNS SETOF text AS $$
+    SELECT name FROM (
+        SELECT image AS name
+        UNION ALL
+        SELECT value FROM jsonb_each_text(renditions)
+    ) names
+    -- the pending renditions are null
+    WHERE name LIKE 'uploads/recipe/blobs/%';
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION core_recipe_image_blob_refs() RETURNS trigger AS $$
+DECLARE
+    change record;
+BEGIN
+    -- a file can be used more than once by a recipe (a small image gives
+    -- the same renditions for several sizes), only the differences are
+    -- written, in the order of the names so concurrent changes of the
+    -- same blobs cannot deadlock
+    FOR change IN
+        SELECT name, sum(delta) AS delta FROM (
+            SELECT name, -1 AS delta FROM core_recipe_blob_names(
+                OLD.image, OLD.image_renditions
+            ) AS name
+            UNION ALL
+            SELECT name, 1 AS delta FROM core_recipe_blob_names(
+                NEW.image, NEW.image_renditions
+            ) AS name
+        ) changes
+        GROUP BY name
+        HAVING sum(delta) <> 0
+        ORDER BY name
+    LOOP
+        IF change.delta > 0 THEN
+            INSERT INTO core_imageblob (name, ref_count, updated_at)
+            VALUES (change.name, change.delta, now())
+            ON CONFLICT (name) DO UPDATE
+            SET ref_count = core_imageblob.ref_count + change.delta,
+                updated_at = now();
+        ELSE
+            UPDATE core_imageblob
+            SET ref_count = ref_count + change.delta, updated_at = now()
+            WHERE name = change.name;
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER core_recipe_image_blob_insert ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_update ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_delete ON core_recipe;
+
+-- the renditions of an image that is not content addressed can be, when
+-- the content addressing was turned on after its upload
+CREATE TRIGGER core_recipe_image_blob_insert
+    AFTER INSERT ON core_recipe
+    FOR EACH ROW WHEN (NEW.image <> '')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+-- only when the files changed, the recipes are updated often otherwise
+CREATE TRIGGER core_recipe_image_blob_update
+    AFTER UPDATE OF image, image_renditions ON core_recipe
+    FOR EACH ROW WHEN (
+        OLD.image IS DISTINCT FROM NEW.image
+        OR OLD.image_renditions IS DISTINCT FROM NEW.image_renditions
+    )
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+CREATE TRIGGER core_recipe_image_blob_delete
+    AFTER DELETE ON core_recipe
+    FOR EACH ROW WHEN (OLD.image <> '')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+UPDATE core_imageblob SET ref_count = 0, updated_at = now();
+INSERT INTO core_imageblob (name, ref_count, updated_at)
+SELECT name, count(*), now()
+FROM core_recipe, core_recipe_blob_names(image, image_renditions) AS name
+GROUP BY name
+ON CONFLICT (name) DO UPDATE SET ref_count = EXCLUDED.ref_count;
+"""
+
+# the triggers of migration 0017, counting the images only
+IMAGE_BLOB_TRIGGERS_SQL = """
+LOCK TABLE core_recipe IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE OR REPLACE FUNCTION core_recipe_image_blob_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.image LIKE 'uploads/recipe/blobs/%' THEN
+        UPDATE core_imageblob
+        SET ref_count = ref_count - 1, updated_at = now()
+        WHERE name = OLD.image;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.image LIKE 'uploads/recipe/blobs/%' THEN
+        INSERT INTO core_imageblob (name, ref_count, updated_at)
+        VALUES (NEW.image, 1, now())
+        ON CONFLICT (name) DO UPDATE
+        SET ref_count = core_imageblob.ref_count + 1, updated_at = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER core_recipe_image_blob_insert ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_update ON core_recipe;
+DROP TRIGGER core_recipe_image_blob_delete ON core_recipe;
+DROP FUNCTION core_recipe_blob_names(text, jsonb);
+
+CREATE TRIGGER core_recipe_image_blob_insert
+    AFTER INSERT ON core_recipe
+    FOR EACH ROW WHEN (NEW.image LIKE 'uploads/recipe/blobs/%')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+CREATE TRIGGER core_recipe_image_blob_update
+    AFTER UPDATE OF image ON core_recipe
+    FOR EACH ROW WHEN (OLD.image IS DISTINCT FROM NEW.image)
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+CREATE TRIGGER core_recipe_image_blob_delete
+    AFTER DELETE ON core_recipe
+    FOR EACH ROW WHEN (OLD.image LIKE 'uploads/recipe/blobs/%')
+    EXECUTE FUNCTION core_recipe_image_blob_refs();
+
+UPDATE core_imageblob SET ref_count = (
+    SELECT count(*) FROM core_recipe WHERE image = core_imageblob.name
+), updated_at = now();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_user_data_changed_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            RENDITION_BLOB_TRIGGERS_SQL,
+            reverse_sql=IMAGE_BLOB_TRIGGERS_SQL,
+        ),
+    ]
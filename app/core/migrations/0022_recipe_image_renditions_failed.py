@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_count_rendition_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions_failed',
+            field=models.BooleanField(default=False, editable=False, verbose_name='image renditions failed'),
+        ),
+    ]
@@ -2,13 +2,19 @@
 Database models.
 """
 from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from core.storage import RecipeImageStorage
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.contrib import auth
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import validate_email, URLValidator
 from django.core.exceptions import ValidationError
@@ -16,6 +22,10 @@ import uuid
 import os
 
 
+# text search configuration used for the recipe search vector
+RECIPE_SEARCH_CONFIG = 'english'
+
+
 # function to be used to generate the patch to the image that
 # will be uploaded
 def recipe_image_file_path(instance, file_name):
@@ -102,7 +112,25 @@ class UserManager(BaseUserManager):
         return self.none()
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class MaintainedFieldsMixin:
+    """Leave the columns in maintained_fields out of full saves.
+
+    They are only changed by relative updates in the database, so saving
+    a loaded and possibly outdated value would undo concurrent changes.
+    """
+    maintained_fields = []
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.maintained_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(MaintainedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     """Custom deffined User in the system"""
 
     email = models.EmailField(
@@ -135,6 +163,24 @@ class User(AbstractBaseUser, PermissionsMixin):
         ),
     )
 
+    # bumped on every change to the user's recipes, tags or ingredients,
+    # it is part of the keys of the cached API responses so the old
+    # responses are never served again (see core.signals)
+    cache_generation = models.PositiveBigIntegerField(
+        _("cache generation"),
+        default=0,
+        editable=False,
+    )
+    # set together with every bump of the generation, the Last-Modified of
+    # the lists (deleted recipes move it too)
+    data_changed_at = models.DateTimeField(
+        _("data changed at"),
+        null=True,
+        editable=False,
+    )
+    # both are set with update() only, a full save leaves them alone
+    maintained_fields = ['cache_generation', 'data_changed_at']
+
     objects = UserManager()
 
     USERNAME_FIELD = "email"
@@ -144,6 +190,65 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name_plural = _("users")
 
 
+class RenditionNames(models.Func):
+    """The file names of the image renditions of a recipe, as a JSON
+    array (indexed, see Recipe.Meta)."""
+    function = 'jsonb_path_query_array'
+    template = "%(function)s(%(expressions)s, '$.*')"
+    output_field = models.JSONField()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Custom queryset for recipes."""
+
+    def _search_vector(self):
+        """Return the expression computing the search vector of a recipe."""
+        # the title weights the most, then the description and then the
+        # names of the attached tags and ingredients, the names are
+        # aggregated in subqueries so everything fits in a single UPDATE
+        tag_names = self.model.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+        ).values('recipe_id').annotate(
+            names=StringAgg('tag__name', ' '),
+        ).values('names')
+        ingredient_names = self.model.ingredients.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+        ).values('recipe_id').annotate(
+            names=StringAgg('ingredient__name', ' '),
+        ).values('names')
+
+        return (
+            SearchVector('title', weight='A', config=RECIPE_SEARCH_CONFIG)
+            + SearchVector(
+                'description', weight='B', config=RECIPE_SEARCH_CONFIG,
+            )
+            + SearchVector(
+                Subquery(tag_names), weight='C', config=RECIPE_SEARCH_CONFIG,
+            )
+            + SearchVector(
+                Subquery(ingredient_names),
+                weight='C',
+                config=RECIPE_SEARCH_CONFIG,
+            )
+        )
+
+    def update_search_vector(self):
+        """Recompute the stored search vector of the selected recipes."""
+        return self.update(search_vector=self._search_vector())
+
+    def touch(self):
+        """Mark the selected recipes as changed.
+
+        Used when something the recipe is made of changed without the
+        recipe being saved (tags, ingredients), it moves updated_at and
+        recomputes the search vector.
+        """
+        return self.update(
+            updated_at=timezone.now(),
+            search_vector=self._search_vector(),
+        )
+
+
 class Recipe(models.Model):
     """Recipe object."""
 
@@ -181,13 +286,69 @@ class Recipe(models.Model):
         null=True,
         # we are just passing the refrence to the function!
         upload_to=recipe_image_file_path,
+        # names the files by their content when that is turned on
+        storage=RecipeImageStorage(),
+    )
+    # the resized copies of the image by their size and format, for example
+    # {"128.webp": "uploads/recipe/renditions/...-128.webp"}, a rendition
+    # still being generated is null (see recipe.renditions)
+    image_renditions = models.JSONField(
+        _('image renditions'), default=dict, blank=True, editable=False,
+    )
+    # a tiny blurred copy of the image as a data URI, shown by the clients
+    # until the image loads, empty until it is generated with the
+    # renditions
+    image_placeholder = models.TextField(
+        _('image placeholder'), blank=True, default='', editable=False,
+    )
+    # the renditions of the image could not be generated (a file Pillow
+    # cannot read), unlike a recipe whose renditions were never generated
+    image_renditions_failed = models.BooleanField(
+        _('image renditions failed'), default=False, editable=False,
     )
+    # title, description, tag and ingredient names for the full text
+    # search, kept up to date by the signals in core.signals
+    search_vector = SearchVectorField(null=True, editable=False)
+    # changes also when the tags or ingredients of the recipe change,
+    # used for the conditional requests of a recipe (ETag, Last-Modified)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # the recipes are always listed for one user, newest first
+            models.Index(
+                fields=['user', '-id'],
+                name='recipe_user_id_desc_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx',
+            ),
+            # the lookups of the files used by the recipes (media
+            # serving, the cleanup of the unused files)
+            models.Index(fields=['image'], name='recipe_image_idx'),
+            GinIndex(
+                RenditionNames('image_renditions'),
+                name='recipe_rendition_names_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
 
-class Tag(models.Model):
+class RecipeCountMixin(MaintainedFieldsMixin):
+    """Keep the recipe_count column maintained by the database.
+
+    The count is changed by triggers on the through table, so saving a
+    loaded and possibly outdated value would undo concurrent changes.
+    """
+    maintained_fields = ['recipe_count']
+
+
+class Tag(RecipeCountMixin, models.Model):
     """Tag for filtering recipes."""
 
     name = models.CharField(_('name'), max_length=255)
@@ -199,11 +360,42 @@ class Tag(models.Model):
         verbose_name=_('user'),
     )
 
+    # number of recipes using the tag, kept up to date by triggers
+    # on the through table (see migration 0014)
+    recipe_count = models.PositiveIntegerField(
+        _('recipe count'), default=0, editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            # trigram index for the fuzzy lookup by name, the user id is
+            # part of it (btree_gin) so the whole lookup runs on the index
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='tag_user_name_trgm_idx',
+            ),
+            # the list of the user sorted by the number of recipes
+            models.Index(
+                fields=['user', '-recipe_count'],
+                name='tag_user_count_idx',
+            ),
+        ]
+        constraints = [
+            # a name is used only once per user, so concurrent requests
+            # cannot create the same tag twice, the unique index also
+            # serves the list of the user sorted by name
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='tag_user_name_unique',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     """Ingredient for recipes."""
     name = models.CharField(_('name'), max_length=255)
     # this is relationship one to many,
@@ -214,5 +406,162 @@ class Ingredient(models.Model):
         verbose_name=_('user'),
     )
 
+    # number of recipes using the ingredient, kept up to date by triggers
+    # on the through table (see migration 0014)
+    recipe_count = models.PositiveIntegerField(
+        _('recipe count'), default=0, editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            # trigram index for the fuzzy lookup by name, the user id is
+            # part of it (btree_gin) so the whole lookup runs on the index
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='ingredient_user_name_trgm_idx',
+            ),
+            # the list of the user sorted by the number of recipes
+            models.Index(
+                fields=['user', '-recipe_count'],
+                name='ingredient_user_count_idx',
+            ),
+        ]
+        constraints = [
+            # a name is used only once per user, so concurrent requests
+            # cannot create the same ingredient twice, the unique index also
+            # serves the list of the user sorted by name
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='ingredient_user_name_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class RecipeImport(models.Model):
+    """Progress of a recipe import, so an interrupted import can resume."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name=_('user'),
+    )
+    # the path of the imported file
+    source = models.CharField(_('source'), max_length=1024)
+    # records of the file already imported, updated in the same
+    # transaction as every imported batch
+    records_done = models.PositiveBigIntegerField(
+        _('records done'), default=0,
+    )
+    finished = models.BooleanField(_('finished'), default=False)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='recipe_import_user_source_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.source
+
+
+class ImageBlob(models.Model):
+    """Image file stored under the hash of its content.
+
+    The rows are written by triggers on the recipe table (see migration
+    0021), every use of the file by a recipe counts, as the image or as
+    one of its renditions. A file counted by none can be deleted.
+    """
+
+    name = models.CharField(_('name'), max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(_('references'), default=0)
+    # the last time the count changed
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
     def __str__(self) -> str:
         return self.name
+
+
+class UserRecipeStats(models.Model):
+    """Recipe statistics of a user.
+
+    Read from a materialized view, refreshed (concurrently, the reads are
+    never blocked) by the refresh_recipe_stats command.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('user'),
+    )
+    recipe_count = models.PositiveIntegerField(_('recipe count'))
+    avg_time_minutes = models.FloatField(_('average time'), null=True)
+    median_time_minutes = models.FloatField(_('median time'), null=True)
+    avg_price = models.DecimalField(
+        _('average price'), max_digits=7, decimal_places=2, null=True,
+    )
+    median_price = models.DecimalField(
+        _('median price'), max_digits=7, decimal_places=2, null=True,
+    )
+    refreshed_at = models.DateTimeField(_('refreshed at'))
+
+    class Meta:
+        managed = False
+        db_table = 'core_user_recipe_stats'
+
+
+class RecipeAttrStats(models.Model):
+    """Number of recipes using a tag or an ingredient, read from a
+    materialized view like UserRecipeStats."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('user'),
+    )
+    name = models.CharField(_('name'), max_length=255)
+    recipe_count = models.PositiveIntegerField(_('recipe count'))
+
+    class Meta:
+        abstract = True
+
+
+class TagStats(RecipeAttrStats):
+    """Number of recipes using a tag."""
+
+    tag = models.OneToOneField(
+        Tag,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('tag'),
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'core_tag_stats'
+
+
+class IngredientStats(RecipeAttrStats):
+    """Number of recipes using an ingredient."""
+
+    ingredient = models.OneToOneField(
+        Ingredient,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        verbose_name=_('ingredient'),
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'core_ingredient_stats'
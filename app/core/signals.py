@@ -0,0 +1,112 @@
+"""
+Signal handlers keeping the data derived from the recipes up to date.
+"""
+from core.cleanup import delete_when_unused
+from core.models import Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+def recipes_changed(recipe_ids):
+    """Refresh everything derived from the given recipes."""
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).touch()
+
+
+def user_data_changed(user_id):
+    """Invalidate the cached API responses of the given user."""
+    # the cache keys contain the generation, so after the bump the old
+    # entries are simply never read again and expire on their own, the
+    # update runs in the same transaction as the change itself
+    get_user_model().objects.filter(pk=user_id).update(
+        cache_generation=F('cache_generation') + 1,
+        data_changed_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    """Refresh a recipe after its own fields were saved."""
+    user_data_changed(instance.user_id)
+    if update_fields is not None and not (
+        {'title', 'description'} & set(update_fields)
+    ):
+        return
+    # updated_at was already set by the save itself
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Invalidate the responses listing a deleted recipe and delete
+    its image files."""
+    user_data_changed(instance.user_id)
+    delete_when_unused([
+        instance.image.name, *instance.image_renditions.values(),
+    ])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Refresh recipes after tags or ingredients were linked or unlinked."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # recipes and their tags/ingredients always share the user
+        user_data_changed(instance.user_id)
+
+    if not reverse:
+        # recipe.tags.add(...) - only this recipe is affected
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            recipes_changed([instance.pk])
+        return
+
+    # tag.recipe_set.add(...) - the affected recipes are in pk_set,
+    # except for clear() where they have to be collected up front
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        recipes_changed(instance.__dict__.pop('_cleared_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        recipes_changed(list(pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+    """Refresh the recipes using a renamed tag or ingredient."""
+    user_data_changed(instance.user_id)
+    if created:
+        return
+    recipes_changed(
+        list(instance.recipe_set.values_list('pk', flat=True))
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleting(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient about to be deleted."""
+    # the m2m rows are gone by the time post_delete is sent
+    instance._deleted_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, **kwargs):
+    """Refresh the recipes that used a deleted tag or ingredient."""
+    user_data_changed(instance.user_id)
+    recipes_changed(instance.__dict__.pop('_deleted_recipe_ids', []))
@@ -0,0 +1,62 @@
+"""
+Storage of the recipe images.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+# directory of the files named by their content, the rows of ImageBlob
+# count the uses of every one of them by the recipes
+BLOB_PREFIX = 'uploads/recipe/blobs/'
+
+
+def content_hash(content):
+    """Return the SHA-256 hex digest of a file, read chunk by chunk."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class RecipeImageStorage(FileSystemStorage):
+    """File system storage that can name the files by their content.
+
+    With RECIPE_IMAGE_CONTENT_ADDRESSED on, a file is stored under the
+    hash of its content, the same image uploaded many times is stored
+    once and every upload after the first only reuses the name.
+    Otherwise the files keep the names they are saved with.
+    """
+
+    def blob_name(self, name, content):
+        """Return the content addressed name of the file."""
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        # two levels, so no directory holds too many files
+        return f'{BLOB_PREFIX}{digest[:2]}/{digest}{extension}'
+
+    def save(self, name, content, max_length=None):
+        if not settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+            return super().save(name, content, max_length=max_length)
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.blob_name(name, content)
+        try:
+            # stored already, marked as recently used so the cleanup of
+            # the unused files keeps it
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        saved_name = self._save(name, content)
+        if saved_name != name:
+            # a concurrent save of the same content won, its file is
+            # identical, the copy saved under another name is dropped
+            self.delete(saved_name)
+        return name
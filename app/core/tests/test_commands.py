@@ -16,6 +16,19 @@ from django.db.utils import OperationalError
 # this is the simple base test case - not simulating the database
 from django.test import SimpleTestCase
 
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+
+from core.models import ImageBlob, Recipe, RecipeImport, Tag
+from core.tests.utils import TempMediaMixin
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.test import TestCase
+
 # this will be the command that we will be mocking, the check method is
 # inhertited form BaseCommand that will allow us to check the status of
 # the database
@@ -96,3 +109,216 @@ class CommandTest(SimpleTestCase):
 
         # makign sure the check method is called with the default database
         mock_patched_check.assert_called_with(databases=['default'])
+
+
+class ImportRecipesTests(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        """Write a file to import and return its path."""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_recipes(self, path, **options):
+        """Run the import for the user and return its output."""
+        out = StringIO()
+        call_command(
+            'import_recipes', path, user=self.user.email, stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """Test importing recipes with their tags and ingredients."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        records = [
+            {'title': 'Curry', 'time_minutes': 30, 'price': '8.50',
+             'tags': ['Vegan', 'Dinner'], 'ingredients': ['Rice']},
+            # the format of the export
+            {'id': 7, 'title': 'Soup', 'time_minutes': 10, 'price': 2,
+             'description': 'Hot soup', 'link': '',
+             'tags': [{'id': 1, 'name': 'Dinner'}], 'ingredients': []},
+        ]
+        path = self.write_file(
+            'recipes.ndjson',
+            '\n'.join(json.dumps(record) for record in records) + '\n',
+        )
+
+        output = self.import_recipes(path)
+
+        self.assertIn('rows/s', output)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [(recipe.title, recipe.price) for recipe in recipes],
+            [('Curry', Decimal('8.50')), ('Soup', Decimal('2.00'))],
+        )
+        self.assertIn(vegan, recipes[0].tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(recipes[1].tags.get().name, 'Dinner')
+        self.assertEqual(recipes[0].ingredients.get().name, 'Rice')
+        self.assertTrue(
+            Recipe.objects.filter(search_vector='rice').exists()
+        )
+
+        # importing the same file again does nothing
+        output = self.import_recipes(path)
+        self.assertIn('already imported', output)
+        self.assertEqual(recipes.count(), 2)
+
+    def test_import_csv(self):
+        """Test importing recipes from a CSV file."""
+        path = self.write_file(
+            'recipes.csv',
+            'title,time_minutes,price,link,description,tags,ingredients\n'
+            'Curry,30,8.50,,"Spicy, hot",Vegan|Dinner,Rice\n'
+            'Salad,5,3,https://example.com,,,\n',
+        )
+
+        self.import_recipes(path)
+
+        curry, salad = Recipe.objects.order_by('id')
+        self.assertEqual(curry.description, 'Spicy, hot')
+        self.assertEqual(curry.tags.count(), 2)
+        self.assertEqual(salad.link, 'https://example.com')
+        self.assertEqual(salad.tags.count(), 0)
+
+    def test_import_resumes_after_last_batch(self):
+        """Test an interrupted import continues after the last batch."""
+        records = [
+            {'title': f'Recipe {number}', 'time_minutes': 5, 'price': 1,
+             'tags': ['Quick']}
+            for number in range(5)
+        ]
+        records[3]['price'] = 'free'
+        content = '\n'.join(json.dumps(record) for record in records)
+        path = self.write_file('recipes.ndjson', content)
+
+        with self.assertRaisesMessage(CommandError, 'Record 4'):
+            self.import_recipes(path, batch_size=2)
+
+        # the first batch was kept, the failed one rolled back
+        self.assertEqual(Recipe.objects.count(), 2)
+        progress = RecipeImport.objects.get(user=self.user)
+        self.assertEqual(progress.records_done, 2)
+
+        records[3]['price'] = 4
+        self.write_file(
+            'recipes.ndjson',
+            '\n'.join(json.dumps(record) for record in records),
+        )
+        output = self.import_recipes(path, batch_size=2)
+
+        self.assertIn('Resuming after record 2', output)
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'title', flat=True,
+            )),
+            [f'Recipe {number}' for number in range(5)],
+        )
+        self.assertEqual(Tag.objects.get().recipe_set.count(), 5)
+
+    def test_import_invalid_fields_error(self):
+        """Test a bad link or time is reported with its record."""
+        for field_name, value in (
+            ('link', 'not a url'),
+            ('link', 'https://example.com/' + 'a' * 255),
+            ('time_minutes', 10**12),
+        ):
+            record = {'title': 'Curry', 'time_minutes': 30, 'price': 8}
+            record[field_name] = value
+            path = self.write_file(
+                f'{field_name}.ndjson', json.dumps(record) + '\n',
+            )
+
+            with self.assertRaisesMessage(CommandError, 'Record 1'):
+                self.import_recipes(path)
+
+        self.assertFalse(Recipe.objects.exists())
+
+
+class DeleteUnusedImagesTests(TempMediaMixin, TestCase):
+    """Test the delete_unused_images command."""
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+            image='uploads/recipe/used.jpg',
+            image_renditions={
+                '128.webp': 'uploads/recipe/renditions/used-128.webp',
+            },
+        )
+
+    def create_file(self, name, age=7200):
+        """Create a file modified age seconds ago."""
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(b'image')
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def delete_unused_images(self, **options):
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command(
+            'delete_unused_images', batch_size=2, stdout=out, **options,
+        )
+        return out.getvalue()
+
+    def test_delete_unused_images(self):
+        """Test only the old files no recipe uses are deleted."""
+        used = [
+            self.create_file('uploads/recipe/used.jpg'),
+            self.create_file('uploads/recipe/renditions/used-128.webp'),
+        ]
+        unused = [
+            self.create_file('uploads/recipe/old.jpg'),
+            self.create_file('uploads/recipe/renditions/old-128.webp'),
+            self.create_file('uploads/recipe/blobs/ab/abc.jpg'),
+        ]
+        kept = [
+            # the upload could still be committing
+            self.create_file('uploads/recipe/new.jpg', age=10),
+            # the resized images are not checked
+            self.create_file('cache/resized/old-w128.webp'),
+        ]
+        ImageBlob.objects.create(name='uploads/recipe/blobs/ab/abc.jpg')
+
+        output = self.delete_unused_images()
+
+        self.assertIn('Checked 6 files, deleted 3 (15 bytes)', output)
+        for path in used + kept:
+            self.assertTrue(os.path.exists(path))
+        for path in unused:
+            self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_dry_run_deletes_nothing(self):
+        """Test the dry run only lists the unused files."""
+        self.create_file('uploads/recipe/used.jpg')
+        path = self.create_file('uploads/recipe/old.jpg')
+
+        output = self.delete_unused_images(dry_run=True)
+
+        self.assertIn('uploads/recipe/old.jpg', output)
+        self.assertIn('Checked 2 files, 1 are unused.', output)
+        self.assertTrue(os.path.exists(path))
@@ -2,10 +2,12 @@
 Test for models from the core application.
 """
 from core import models
+from core.signals import user_data_changed
 from decimal import Decimal
 # helper function to get the default User model for the project
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
 from django.test import TestCase
 from unittest.mock import patch
@@ -164,6 +166,142 @@ class ModelTests(TestCase):
         # check if the ingredient got created
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_and_ingredient_names_unique_per_user(self):
+        """Test a user cannot have the same tag or ingredient name twice."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+
+        for model in (models.Tag, models.Ingredient):
+            model.objects.create(user=user, name='Vegan')
+            # another user can use the same name
+            model.objects.create(user=other_user, name='Vegan')
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    model.objects.create(user=user, name='Vegan')
+
+    def test_recipe_search_vector_follows_changes(self):
+        """Test the search vector is refreshed when the recipe, its tags or
+        its ingredients change."""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='Breakfast')
+        ingredient = models.Ingredient.objects.create(user=user, name='Flour')
+
+        def matches(term):
+            return models.Recipe.objects.filter(
+                pk=recipe.pk, search_vector=term,
+            ).exists()
+
+        self.assertTrue(matches('pancakes'))
+        recipe.tags.add(tag)
+        ingredient.recipe_set.add(recipe)
+        self.assertTrue(matches('breakfast'))
+        self.assertTrue(matches('flour'))
+
+        tag.name = 'Brunch'
+        tag.save()
+        self.assertTrue(matches('brunch'))
+        self.assertFalse(matches('breakfast'))
+
+        ingredient.delete()
+        self.assertFalse(matches('flour'))
+
+        recipe.title = 'Waffles'
+        recipe.save()
+        self.assertTrue(matches('waffles'))
+
+    def test_recipe_updated_at_follows_relations(self):
+        """Test updated_at moves when the tags of a recipe change."""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        created_at = recipe.updated_at
+
+        recipe.tags.add(models.Tag.objects.create(user=user, name='Sweet'))
+        recipe.refresh_from_db()
+
+        self.assertGreater(recipe.updated_at, created_at)
+
+    def test_recipe_count_follows_relations(self):
+        """Test the recipe count of tags and ingredients is maintained."""
+        user = create_user()
+        recipes = [
+            models.Recipe.objects.create(
+                user=user,
+                title=f'Recipe {number}',
+                time_minutes=5,
+                price=Decimal('5.50'),
+            )
+            for number in range(3)
+        ]
+        tag = models.Tag.objects.create(user=user, name='Sweet')
+        other_tag = models.Tag.objects.create(user=user, name='Salty')
+        ingredient = models.Ingredient.objects.create(user=user, name='Salt')
+
+        def counts():
+            tag.refresh_from_db()
+            other_tag.refresh_from_db()
+            return tag.recipe_count, other_tag.recipe_count
+
+        tag.recipe_set.add(*recipes)
+        recipes[0].ingredients.add(ingredient)
+        self.assertEqual(counts(), (3, 0))
+
+        recipes[0].tags.set([other_tag])
+        self.assertEqual(counts(), (2, 1))
+
+        recipes[1].tags.remove(tag)
+        recipes[2].delete()
+        self.assertEqual(counts(), (0, 1))
+
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 1)
+        recipes[0].ingredients.clear()
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 0)
+
+    def test_save_keeps_recipe_count(self):
+        """Test saving an outdated tag does not overwrite its count."""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='Sweet')
+
+        # the count changes after the tag was loaded
+        recipe.tags.add(tag)
+        tag.name = 'Sugary'
+        tag.save()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Sugary')
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_save_keeps_cache_generation(self):
+        """Test saving an outdated user does not undo a generation bump."""
+        user = create_user()
+        stale = get_user_model().objects.get(pk=user.pk)
+
+        user_data_changed(user.pk)
+        stale.name = 'New name'
+        stale.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'New name')
+        self.assertEqual(user.cache_generation, 1)
+
     # ensuring the path name is unique
     # patching the uuid4 function - replacing the value of uuid
     @patch('core.models.uuid.uuid4')
@@ -176,3 +314,28 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+    def test_hot_path_indexes_exist(self):
+        """Test the composite indexes used by the list endpoints exist."""
+        expected = {
+            'core_recipe': ('recipe_user_id_desc_idx', ['user_id', 'id']),
+            'core_tag': ('tag_user_name_unique', ['user_id', 'name']),
+            'core_ingredient': (
+                'ingredient_user_name_unique', ['user_id', 'name'],
+            ),
+            'core_recipe_tags': (
+                'recipe_tags_tag_recipe_idx', ['tag_id', 'recipe_id'],
+            ),
+            'core_recipe_ingredients': (
+                'recipe_ingredients_ingr_recipe_idx',
+                ['ingredient_id', 'recipe_id'],
+            ),
+        }
+
+        with connection.cursor() as cursor:
+            for table, (name, columns) in expected.items():
+                constraints = connection.introspection.get_constraints(
+                    cursor, table,
+                )
+                self.assertIn(name, constraints)
+                self.assertEqual(constraints[name]['columns'], columns)
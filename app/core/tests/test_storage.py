@@ -0,0 +1,136 @@
+"""
+Tests for the storage of the recipe images.
+"""
+import os
+import time
+from decimal import Decimal
+
+from core.cleanup import referenced_names
+from core.models import ImageBlob, Recipe
+from core.storage import BLOB_PREFIX
+from core.tests.utils import TempMediaMixin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+
+
+@override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=True)
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    """Test storing the images under the hash of their content."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {number}',
+                time_minutes=5,
+                price=Decimal('5.50'),
+            )
+            for number in range(3)
+        ]
+
+    def blob(self, name):
+        """Return the reference count of the stored file."""
+        return ImageBlob.objects.get(name=name).ref_count
+
+    def test_same_content_stored_once(self):
+        """Test the same image uploaded twice is stored once."""
+        for recipe in self.recipes[:2]:
+            recipe.image.save('photo.JPG', ContentFile(b'same photo'))
+        self.recipes[2].image.save('other.jpg', ContentFile(b'other photo'))
+
+        first, second, third = (recipe.image.name for recipe in self.recipes)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertTrue(first.startswith(BLOB_PREFIX))
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(self.recipes[0].image.path))), 1,
+        )
+        self.assertEqual(self.blob(first), 2)
+        self.assertEqual(self.blob(third), 1)
+
+    def test_reference_count_follows_recipes(self):
+        """Test the count drops when images are replaced or deleted."""
+        for recipe in self.recipes:
+            recipe.image.save('photo.jpg', ContentFile(b'same photo'))
+        name = self.recipes[0].image.name
+
+        self.recipes[0].image.save('new.jpg', ContentFile(b'new photo'))
+        self.assertEqual(self.blob(name), 2)
+
+        self.recipes[1].delete()
+        self.assertEqual(self.blob(name), 1)
+
+        # bulk deletes send no signals, the count still follows
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM core_recipe WHERE id = %s',
+                [self.recipes[2].pk],
+            )
+        self.assertEqual(self.blob(name), 0)
+        self.assertEqual(self.blob(self.recipes[0].image.name), 1)
+
+    def test_reference_count_includes_renditions(self):
+        """Test the renditions count as uses of the shared files."""
+        self.recipes[0].image.save('photo.jpg', ContentFile(b'same photo'))
+        storage = self.recipes[0].image.storage
+        small = storage.save('small.webp', ContentFile(b'small'))
+        large = storage.save('large.webp', ContentFile(b'large'))
+        recipe = Recipe.objects.filter(pk=self.recipes[0].pk)
+
+        # a small image gives the same file for both sizes
+        recipe.update(image_renditions={'128.webp': small, '1024.webp': small})
+        self.assertEqual(self.blob(small), 2)
+        self.assertEqual(referenced_names([small, large]), {small})
+
+        recipe.update(image_renditions={'128.webp': small, '1024.webp': large})
+        self.assertEqual(self.blob(small), 1)
+        self.assertEqual(self.blob(large), 1)
+
+        recipe.delete()
+        self.assertEqual(self.blob(small), 0)
+        self.assertEqual(self.blob(large), 0)
+        self.assertEqual(referenced_names([small, large]), set())
+
+    @override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=False)
+    def test_random_names_without_content_addressing(self):
+        """Test the images keep their unique names by default."""
+        for recipe in self.recipes[:2]:
+            recipe.image.save('photo.jpg', ContentFile(b'same photo'))
+
+        self.assertNotEqual(
+            self.recipes[0].image.name,
+            self.recipes[1].image.name,
+        )
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_deleted_recipe_files_deleted(self):
+        """Test the files of a deleted recipe go once nothing uses them."""
+        for recipe in self.recipes[:2]:
+            recipe.image.save('photo.jpg', ContentFile(b'same photo'))
+        self.recipes[2].image.save('other.jpg', ContentFile(b'other photo'))
+        shared = self.recipes[0].image.path
+        other = self.recipes[2].image.path
+        # older than the minimum age of the shared files
+        modified = time.time() - 7200
+        for path in (shared, other):
+            os.utime(path, (modified, modified))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        # still the image of the second recipe
+        self.assertTrue(os.path.exists(shared))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].delete()
+            self.recipes[2].delete()
+        self.assertFalse(os.path.exists(shared))
+        self.assertFalse(os.path.exists(other))
+        self.assertFalse(ImageBlob.objects.exists())
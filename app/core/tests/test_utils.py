@@ -0,0 +1,37 @@
+"""
+Test the helpers shared by the tests.
+"""
+from core.tests.utils import query_budget
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+
+class QueryBudgetTests(TestCase):
+    """Test the query budget helper."""
+
+    def test_within_budget(self):
+        """Test no error is raised when the budget is respected."""
+        with query_budget(1) as context:
+            get_user_model().objects.exists()
+
+        self.assertEqual(len(context), 1)
+
+    def test_over_budget_fails(self):
+        """Test an AssertionError is raised when the budget is exceeded."""
+        with self.assertRaises(AssertionError) as error:
+            with query_budget(1):
+                get_user_model().objects.exists()
+                get_user_model().objects.count()
+
+        # the message should point out the offending queries
+        self.assertIn('2 queries executed', str(error.exception))
+        self.assertIn('SELECT', str(error.exception))
+
+    def test_used_as_decorator(self):
+        """Test the budget can decorate a function."""
+        @query_budget(0)
+        def run_queries():
+            get_user_model().objects.exists()
+
+        with self.assertRaises(AssertionError):
+            run_queries()
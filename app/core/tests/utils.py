@@ -0,0 +1,91 @@
+"""
+Helpers shared by the tests of all the apps.
+"""
+import shutil
+import tempfile
+from contextlib import ContextDecorator
+from decimal import Decimal
+
+from core.models import Recipe
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class query_budget(ContextDecorator):
+    """Fail the test when the wrapped code runs more than max_queries
+    queries against the database.
+
+    Can be used as a context manager around a single request or as a
+    decorator on a whole test method, ex:
+
+        with query_budget(3):
+            self.client.get(RECIPE_URL)
+    """
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        # CaptureQueriesContext forces the debug cursor on the connection
+        # so every executed query is recorded, even with DEBUG = False
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        # a failing test should report its own error, not the budget
+        if exc_type is not None:
+            return False
+
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(
+                    self.context.captured_queries, start=1
+                )
+            )
+            raise AssertionError(
+                f'{executed} queries executed, the budget is '
+                f'{self.max_queries}.\nCaptured queries were:\n{queries}'
+            )
+        return False
+
+
+class TempMediaMixin:
+    """TestCase mixin writing the media files of every test to a new
+    temporary MEDIA_ROOT (self.media_root), deleted after the test."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+
+class RecipeMediaMixin(TempMediaMixin):
+    """TestCase mixin with a temporary MEDIA_ROOT, a user (self.user)
+    with a recipe (self.recipe) and an API client authenticated as the
+    user (self.client)."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
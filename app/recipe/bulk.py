@@ -0,0 +1,63 @@
+"""
+Selection of the objects changed by the bulk actions.
+"""
+from django.db import connections, router
+from rest_framework.exceptions import ValidationError
+from recipe.serializers import BulkSelectionSerializer
+
+
+def delete_by_ids(model, ids):
+    """Delete the rows of the model with the ids with one DELETE statement
+    and return how many were deleted.
+
+    Nothing is loaded and no delete signals are sent, the caller deletes
+    the related rows first and refreshes the derived data itself.
+    """
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name(model._meta.pk.column)} '
+            '= ANY(%s)',
+            [list(ids)],
+        )
+        return cursor.rowcount
+
+
+class BulkSelectionMixin:
+    """Select the objects of a bulk action by their ids, the filters of
+    the list, or both.
+
+    Only the ids are loaded, the bulk actions then run a few set based
+    statements on them, so no model instances are created and no signals
+    are sent. The data derived from the changed objects has to be
+    refreshed by the actions themselves.
+    """
+
+    # the query params of the list that narrow down the selection
+    bulk_filter_params = []
+
+    def get_bulk_ids(self, request):
+        """Return the ids of the user's objects selected by the request."""
+        serializer = BulkSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids')
+        filtered = any(
+            request.query_params.get(param)
+            for param in self.bulk_filter_params
+        )
+        # an empty request never selects everything by accident
+        if ids is None and not filtered:
+            raise ValidationError({
+                'ids': (
+                    'Give the ids, or filter the objects with: '
+                    f'{", ".join(self.bulk_filter_params)}.'
+                ),
+            })
+
+        # the queryset of the list, limited to the user and filtered
+        queryset = self.get_queryset()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        # the order does not matter, and would add columns to the SELECT
+        return list(queryset.order_by().values_list('pk', flat=True))
@@ -0,0 +1,154 @@
+"""
+Caching of the recipe API responses.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Max
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+
+def normalized_params(request):
+    """Return the query params of the request in a stable order."""
+    # the order of the params does not change the response
+    return urlencode(sorted(request.query_params.lists()), doseq=True)
+
+
+def _user_state(request):
+    """Return the cache generation and the data_changed_at of the
+    requesting user."""
+    # always read from the database, the user of the request could have
+    # been loaded before the last change, but only once per request
+    if not hasattr(request, '_user_state'):
+        request._user_state = get_user_model().objects.filter(
+            pk=request.user.pk,
+        ).values_list('cache_generation', 'data_changed_at').first()
+    return request._user_state
+
+
+def cache_generation(request):
+    """Return the current cache generation of the requesting user."""
+    return _user_state(request)[0]
+
+
+def data_changed_at(request):
+    """Return when the data of the requesting user last changed, None
+    when it never did."""
+    return _user_state(request)[1]
+
+
+class CachedListMixin:
+    """Serve the list action from the cache, per user.
+
+    The key is made of the user, the endpoint, the normalized query params
+    and the cache generation of the user. Every write to the user's
+    recipes, tags or ingredients bumps the generation, so a cached
+    response can never be stale and nothing has to be deleted.
+    """
+
+    def get_list_cache_key(self, request):
+        """Return the cache key of the list response for the request."""
+        raw_key = ':'.join([
+            str(request.user.pk),
+            str(cache_generation(request)),
+            # the links in the paginated responses are absolute
+            request.get_host(),
+            request.path,
+            normalized_params(request),
+        ])
+        digest = hashlib.md5(raw_key.encode()).hexdigest()
+        return f'api-list:{request.user.pk}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        """Return the cached list response or build and cache it."""
+        key = self.get_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """Answer conditional GET requests (If-None-Match, If-Modified-Since)
+    of the list and retrieve actions.
+
+    A single object is checked against its updated_at. A list is checked
+    against the cache generation (ETag) and the data_changed_at
+    (Last-Modified) of the user, both also move when an object is deleted
+    or stops matching a filter. Both run before anything is loaded or
+    serialized.
+    """
+
+    def _etag(self, request, *parts):
+        """Return a quoted ETag for the parts and the request params."""
+        raw_etag = ':'.join(
+            [str(part) for part in parts]
+            # the params tell the pages and the fields apart
+            + [request.path, normalized_params(request)]
+        )
+        return quote_etag(hashlib.md5(raw_etag.encode()).hexdigest())
+
+    def _conditional_response(self, request, etag, last_modified, handler,
+                              *args, **kwargs):
+        """Return a 304 response or the response of the handler."""
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        # the responses are different for every user, and the clients
+        # should always check if their copy is still fresh
+        patch_vary_headers(response, ['Authorization'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Return the list, or 304 when the client has it already."""
+        etag = self._etag(request, cache_generation(request))
+        return self._conditional_response(
+            request, etag, data_changed_at(request), super().list,
+            *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the object, or 304 when the client has it already."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            last_modified = self.get_queryset().filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            ).order_by().aggregate(
+                last_modified=Max('updated_at'),
+            )['last_modified']
+        except (TypeError, ValueError, ValidationError):
+            # an invalid lookup value (like a text id) is not found either
+            last_modified = None
+        if last_modified is None:
+            # not found, the default response is a 404
+            return super().retrieve(request, *args, **kwargs)
+        etag = self._etag(request, last_modified.isoformat())
+        return self._conditional_response(
+            request, etag, last_modified, super().retrieve, *args, **kwargs
+        )
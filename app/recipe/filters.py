@@ -0,0 +1,15 @@
+"""
+Filter backends for the recipe APIs.
+"""
+from rest_framework import filters
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """Ordering filter sorting search results by relevance by default."""
+
+    def get_default_ordering(self, view):
+        # the search annotates every recipe with its rank, the best
+        # matches come first and the id breaks the ties
+        if view.request.query_params.get('search'):
+            return ['-rank', '-id']
+        return super().get_default_ordering(view)
@@ -0,0 +1,184 @@
+"""
+Disk cache of the recipe images resized on demand.
+"""
+import fcntl
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from core.models import Recipe
+from django.conf import settings
+from PIL import Image, ImageOps
+from recipe.renditions import FORMATS
+
+
+# the cache is scanned for an eviction once this share of the limit was
+# written to it by the process, not on every miss
+EVICT_EVERY = 0.05
+
+# bytes written by this process since its last eviction, None until the
+# first write, which always checks the cache
+_written = None
+_written_lock = threading.Lock()
+
+
+def cache_dir():
+    """Return the directory of the cached images."""
+    return os.path.join(settings.MEDIA_ROOT, settings.RECIPE_IMAGE_CACHE_DIR)
+
+
+def cached_name(image_name, width, image_format):
+    """Return the file name of a resized image in the cache."""
+    # the names of the originals are unique, a new image of the recipe
+    # never hits the cached copies of the previous one
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{stem}-w{width}.{FORMATS[image_format][1]}'
+
+
+@contextmanager
+def _locked(path, blocking=True):
+    """Hold an exclusive lock on the file, shared by all the processes.
+
+    Yields False when blocking is off and someone else holds the lock.
+    """
+    with open(path, 'a') as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _resize(image_name, width, image_format, path):
+    """Resize the original image and write it to the path."""
+    pillow_format, _, options = FORMATS[image_format]
+    storage = Recipe._meta.get_field('image').storage
+    with storage.open(image_name) as file, Image.open(file) as image:
+        # JPEGs are decoded straight at a reduced scale (1/2 - 1/8) that
+        # is still at least as wide as requested
+        image.draft('RGB', (width, 1))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            # reducing_gap shrinks by whole factors with reduce() first,
+            # the slower resampling only runs on the last step
+            image = image.resize(
+                (width, height), Image.LANCZOS, reducing_gap=3.0,
+            )
+
+        # written next to the target and renamed, so a half written file
+        # is never served
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix='.tmp',
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                image.save(temp_file, format=pillow_format, **options)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def evict():
+    """Delete the least recently used images above the size limit.
+
+    The cache is trimmed down to 90% of the limit, so the next misses
+    do not have to evict again right away. Only one process evicts at a
+    time, the others skip it.
+    """
+    directory = cache_dir()
+    limit = settings.RECIPE_IMAGE_CACHE_MAX_BYTES
+    with _locked(os.path.join(directory, '.evict.lock'), False) as locked:
+        if not locked:
+            return
+        entries = []
+        total = 0
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if entry.name.startswith('.') or entry.name.endswith(
+                    ('.lock', '.tmp')
+                ):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= limit:
+            return
+
+        # the hits move the modification time, the oldest go first
+        for _, size, path in sorted(entries):
+            if total <= limit * 0.9:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _eviction_due(size):
+    """Count the bytes of a new cached image, return True when the cache
+    has to be checked for an eviction."""
+    global _written
+    every = settings.RECIPE_IMAGE_CACHE_MAX_BYTES * EVICT_EVERY
+    with _written_lock:
+        if _written is not None and _written + size < every:
+            _written += size
+            return False
+        _written = 0
+        return True
+
+
+def open_resized(image_name, width, image_format):
+    """Return the resized image opened for reading, resize it on a miss.
+
+    Concurrent requests for the same image wait for the one that resizes
+    it (a lock file per image, also between the processes) and then
+    read the result, so every image is resized only once.
+    """
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(
+        directory, cached_name(image_name, width, image_format),
+    )
+    try:
+        # opened right away, an open file can still be read after the
+        # eviction deleted it
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        # a hit marks the image as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return file
+
+    resized = False
+    with _locked(f'{path}.lock'):
+        # made by another request while this one was waiting
+        if not os.path.exists(path):
+            _resize(image_name, width, image_format, path)
+            resized = True
+        file = open(path, 'rb')
+    # the waiting requests hold the lock file open already, the later
+    # ones find the image and never get to the lock
+    try:
+        os.unlink(f'{path}.lock')
+    except FileNotFoundError:
+        pass
+    # after the lock of the image is released, the scan of the whole cache
+    # does not hold up the requests waiting for it
+    if resized and _eviction_due(os.fstat(file.fileno()).st_size):
+        evict()
+    return file
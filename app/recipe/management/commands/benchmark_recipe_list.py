@@ -0,0 +1,120 @@
+"""
+Django command to compare the recipe list serializers.
+"""
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.serializers import RecipeReadSerializer, RecipeSerializer
+
+from typing import Any
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe list serializers."""
+    help = (
+        "Serialize the same recipes with RecipeSerializer and "
+        "RecipeReadSerializer and print the timings. The sample data is "
+        "rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000],
+            help='Numbers of recipes to serialize.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Runs of every measurement, the best one is reported.',
+        )
+
+    def _create_recipes(self, user, size):
+        """Create the sample recipes with 3 tags and 5 ingredients each."""
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {number}') for number in range(20)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {number}')
+            for number in range(50)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {number}',
+                time_minutes=number % 120,
+                price=Decimal(number % 1000) / 10,
+                link=f'https://example.com/{number}',
+            )
+            for number in range(size)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe_id=recipe.id,
+                tag_id=tags[(number + offset) % len(tags)].id,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(3)
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    (number + offset) % len(ingredients)
+                ].id,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(5)
+        )
+
+    def _best_time(self, repeat, serialize):
+        """Return the best time of the runs in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            serialize()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        self.stdout.write(
+            f'{"recipes":>8} {"RecipeSerializer":>18} '
+            f'{"RecipeReadSerializer":>22} {"speedup":>8}'
+        )
+        for size in options['sizes']:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(
+                    email=f'benchmark-{size}@example.com',
+                )
+                self._create_recipes(user, size)
+                recipes = Recipe.objects.filter(user=user).order_by('-id')
+                columns = [
+                    field_name for field_name in RecipeSerializer.Meta.fields
+                    if field_name not in ('tags', 'ingredients')
+                ]
+
+                # both include loading the rows, as the list view does
+                default = self._best_time(
+                    options['repeat'],
+                    lambda: RecipeSerializer(
+                        recipes.prefetch_related('tags', 'ingredients'),
+                        many=True,
+                    ).data,
+                )
+                read = self._best_time(
+                    options['repeat'],
+                    lambda: RecipeReadSerializer(
+                        recipes.values(*columns), many=True,
+                    ).data,
+                )
+                # nothing created by the benchmark is kept
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f'{size:>8} {default:>16.1f}ms {read:>20.1f}ms '
+                f'{default / read:>7.1f}x'
+            )
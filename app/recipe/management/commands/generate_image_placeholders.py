@@ -0,0 +1,83 @@
+"""
+Django command to generate the placeholders of the existing recipe images.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Recipe
+from core.signals import user_data_changed
+from recipe.renditions import image_placeholder
+
+from typing import Any
+
+
+class Command(BaseCommand):
+    """Django command to backfill the recipe image placeholders."""
+    help = (
+        "Generate the placeholders of the recipe images that have none, "
+        "like the images uploaded before the placeholders existed. The "
+        "recipes are read in batches by id, so the command can be stopped "
+        "and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Recipes handled (and committed) at once.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        storage = Recipe._meta.get_field('image').storage
+        # the images whose renditions failed cannot be read either
+        recipes = Recipe.objects.filter(
+            image_placeholder='',
+            image_renditions_failed=False,
+        ).exclude(image='').exclude(image__isnull=True).order_by('pk')
+
+        last_id = 0
+        generated = failed = 0
+        while batch := list(
+            recipes.filter(pk__gt=last_id).values_list(
+                'pk', 'user_id', 'image',
+            )[:options['batch_size']]
+        ):
+            last_id = batch[-1][0]
+            placeholders = []
+            for recipe_id, user_id, image_name in batch:
+                try:
+                    placeholders.append((
+                        recipe_id,
+                        user_id,
+                        image_name,
+                        image_placeholder(storage, image_name),
+                    ))
+                except Exception as error:
+                    # missing or unreadable files are skipped, the same
+                    # images get no renditions either
+                    failed += 1
+                    self.stderr.write(f'{image_name}: {error}')
+
+            with transaction.atomic():
+                users = set()
+                for recipe_id, user_id, image_name, data_uri in placeholders:
+                    # only while the recipe still has the same image, a
+                    # new upload gets its own placeholder
+                    if Recipe.objects.filter(
+                        pk=recipe_id,
+                        image=image_name,
+                        image_placeholder='',
+                    ).update(
+                        image_placeholder=data_uri,
+                        updated_at=timezone.now(),
+                    ):
+                        generated += 1
+                        users.add(user_id)
+                # the cached responses of the users are refreshed
+                for user_id in users:
+                    user_data_changed(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {generated} placeholders, {failed} images failed.'
+        ))
@@ -0,0 +1,82 @@
+"""
+Django command to generate the missing renditions of the recipe images.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.cleanup import delete_unreferenced
+from core.models import Recipe, RenditionNames
+from recipe.renditions import generate_renditions, rendition_keys
+
+from typing import Any
+
+
+class Command(BaseCommand):
+    """Django command to backfill the recipe image renditions."""
+    help = (
+        "Generate the renditions of the recipe images that are still "
+        "pending or miss some of the configured sizes and formats, like "
+        "the jobs lost when a worker process stopped, the images uploaded "
+        "before the renditions existed or after the settings changed. The "
+        "images whose renditions failed before are skipped, unless "
+        "--retry-failed is given. The recipes are read in batches by id, "
+        "so the command can be stopped and run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Recipes read from the database at once.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=600,
+            help=(
+                'Only recipes not changed in the last seconds, the newer '
+                'ones can still be in the queue of a worker.'
+            ),
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Also the images whose renditions failed before.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> str | None:
+        """Entry point for command."""
+        changed_before = timezone.now() - timedelta(
+            seconds=options['min_age'],
+        )
+        recipes = Recipe.objects.alias(
+            rendition_names=RenditionNames('image_renditions'),
+        ).filter(
+            # a size or format is missing, or still pending (null)
+            ~Q(image_renditions__has_keys=rendition_keys())
+            | Q(rendition_names__contains=[None]),
+            updated_at__lt=changed_before,
+        ).exclude(image='').exclude(image__isnull=True).order_by('pk')
+        if not options['retry_failed']:
+            # an unreadable file would fail again on every run
+            recipes = recipes.filter(image_renditions_failed=False)
+
+        last_id = 0
+        generated = 0
+        while batch := list(
+            recipes.filter(pk__gt=last_id).values_list(
+                'pk', 'user_id', 'image', 'image_renditions',
+            )[:options['batch_size']]
+        ):
+            last_id = batch[-1][0]
+            for recipe_id, user_id, image_name, renditions in batch:
+                # the same as after an upload, only stored while the
+                # recipe still has the same image
+                generate_renditions(recipe_id, user_id, image_name)
+                # the files of the renditions generated before are
+                # replaced by the new ones
+                delete_unreferenced(renditions.values())
+                generated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated the renditions of {generated} images.'
+        ))
@@ -0,0 +1,40 @@
+"""
+Responses with the stored media files.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+
+def media_response(name, file=None, content_type=None):
+    """Return the response sending the media file with the given name.
+
+    Behind nginx (MEDIA_X_ACCEL_PREFIX set) the response is empty and
+    only tells nginx which file to send from its internal location, so
+    nginx reads the file with sendfile and answers the range requests,
+    and the application worker is free right away. Without it the file
+    is streamed by Django, which is fine for the development server.
+
+    The file can be passed already opened, it is then streamed without
+    opening it again.
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(name)[0] or (
+            'application/octet-stream'
+        )
+
+    if settings.MEDIA_X_ACCEL_PREFIX:
+        if file is not None:
+            file.close()
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            f'{settings.MEDIA_X_ACCEL_PREFIX.rstrip("/")}/{name}'
+        )
+        return response
+
+    if file is None:
+        file = open(os.path.join(settings.MEDIA_ROOT, name), 'rb')
+    return FileResponse(file, content_type=content_type)
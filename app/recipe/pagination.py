@@ -0,0 +1,20 @@
+"""
+Pagination classes for the recipe APIs.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination for recipes.
+
+    The cursor holds the position of the last returned row, so every page
+    is read with a `WHERE id < position` condition on the index instead of
+    an OFFSET scan, and no COUNT(*) query is ever run.
+    """
+    page_size = 20
+    # the client can ask for smaller or bigger pages, up to max_page_size
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # default ordering, the ordering filter of the view can change it
+    # to any of its supported (unique) sort keys
+    ordering = '-id'
@@ -0,0 +1,187 @@
+"""
+Resized copies (renditions) of the recipe images.
+"""
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.cleanup import delete_unreferenced
+from core.models import Recipe
+from core.signals import user_data_changed
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, file extension and save options of every format
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+}
+# the placeholders only have to look like a blurred image, a low quality
+# keeps them small
+PLACEHOLDER_OPTIONS = {'quality': 30, 'method': 6}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_keys():
+    """Return the keys of the renditions, like '128.webp'."""
+    return [
+        f'{size}.{image_format}'
+        for size in settings.RECIPE_IMAGE_RENDITION_SIZES
+        for image_format in settings.RECIPE_IMAGE_RENDITION_FORMATS
+    ]
+
+
+def pending_renditions():
+    """Return the renditions of a new image, none of them is ready yet."""
+    return dict.fromkeys(rendition_keys())
+
+
+def rendition_path(image_name, size, image_format):
+    """Return the storage path of a rendition of the image."""
+    directory, file_name = os.path.split(image_name)
+    stem = os.path.splitext(file_name)[0]
+    extension = FORMATS[image_format][1]
+    return os.path.join(
+        directory, 'renditions', f'{stem}-{size}.{extension}',
+    )
+
+
+def _get_executor():
+    """Return the pool of the worker threads, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-renditions',
+            )
+    return _executor
+
+
+def placeholder(image):
+    """Return a tiny copy of the image as a data URI, the clients show it
+    blurred until the image loads."""
+    size = settings.RECIPE_IMAGE_PLACEHOLDER_SIZE
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', **PLACEHOLDER_OPTIONS)
+    return 'data:image/webp;base64,' + (
+        base64.b64encode(buffer.getvalue()).decode('ascii')
+    )
+
+
+def image_placeholder(storage, image_name):
+    """Return the placeholder of the stored image."""
+    size = settings.RECIPE_IMAGE_PLACEHOLDER_SIZE
+    with storage.open(image_name) as file, Image.open(file) as image:
+        # JPEGs are decoded at a fraction of their size
+        image.draft('RGB', (size, size))
+        return placeholder(ImageOps.exif_transpose(image))
+
+
+def _render(storage, image_name):
+    """Generate the renditions of the stored image, return their names and
+    the placeholder of the image."""
+    sizes = sorted(settings.RECIPE_IMAGE_RENDITION_SIZES, reverse=True)
+    names = {}
+    with storage.open(image_name) as file, Image.open(file) as image:
+        # JPEGs are decoded at a reduced scale when the biggest rendition
+        # is much smaller than the photo, which is most of the work
+        image.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        # from the biggest to the smallest, every rendition is resized
+        # from the previous one instead of the full image
+        for size in sizes:
+            # thumbnail() keeps the aspect ratio and never enlarges
+            image.thumbnail((size, size), Image.LANCZOS)
+            for image_format in settings.RECIPE_IMAGE_RENDITION_FORMATS:
+                pillow_format, _, options = FORMATS[image_format]
+                buffer = io.BytesIO()
+                image.save(buffer, format=pillow_format, **options)
+                names[f'{size}.{image_format}'] = storage.save(
+                    rendition_path(image_name, size, image_format),
+                    ContentFile(buffer.getvalue()),
+                )
+        # and the placeholder from the smallest rendition
+        return names, placeholder(image)
+
+
+def generate_renditions(recipe_id, user_id, image_name):
+    """Generate the renditions and the placeholder of a recipe image and
+    store them."""
+    storage = Recipe._meta.get_field('image').storage
+    try:
+        names, data_uri = _render(storage, image_name)
+    except Exception:
+        # an image Pillow cannot read gets no renditions, the clients use
+        # the original image
+        logger.exception('Renditions of %s failed.', image_name)
+        names, data_uri, failed = {}, '', True
+    else:
+        failed = False
+
+    with transaction.atomic():
+        # only while the recipe still has the same image, it could have
+        # been replaced or removed in the meantime
+        updated = Recipe.objects.filter(
+            pk=recipe_id,
+            image=image_name,
+        ).update(
+            image_renditions=names,
+            image_placeholder=data_uri,
+            image_renditions_failed=failed,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            user_data_changed(user_id)
+
+    if not updated:
+        # shared files (content addressed) can be used by other recipes
+        delete_unreferenced(names.values())
+
+
+def _generate_in_worker(*args):
+    """Generate the renditions in a worker thread."""
+    try:
+        generate_renditions(*args)
+    finally:
+        # the connections of the worker thread are its own
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Generate the renditions of the recipe image once the transaction
+    that saved the image commits.
+
+    The recipe has to be saved with pending_renditions() already, the
+    renditions are then filled in by a worker thread. The queue only lives
+    in the process, the jobs lost when it stops are redone by the
+    generate_image_renditions command.
+    """
+    if not recipe.image:
+        return
+    args = (recipe.pk, recipe.user_id, recipe.image.name)
+
+    def submit():
+        if settings.RECIPE_IMAGE_WORKERS:
+            _get_executor().submit(_generate_in_worker, *args)
+        else:
+            generate_renditions(*args)
+
+    transaction.on_commit(submit)
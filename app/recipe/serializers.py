@@ -2,9 +2,57 @@
 Serializers for reipe APIs
 """
 from core.models import Recipe, Tag, Ingredient
+from core.signals import recipes_changed, user_data_changed
+from django.conf import settings
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
+from recipe.renditions import FORMATS
+from recipe.uploads import ValidatedImageField
 from rest_framework import serializers
 
 
+def get_or_create_by_name(model, user, names):
+    """Return the tags/ingredients of the user with the names, by name.
+
+    The existing ones are loaded with one query and the missing ones are
+    inserted with one statement. A name created in the meantime by another
+    request is skipped by the insert (ON CONFLICT DO NOTHING) and loaded
+    with the other new ones afterwards.
+    """
+    names = list(dict.fromkeys(names))
+    by_name = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    # sorted, so concurrent requests inserting the same new names take
+    # the locks of the unique index in the same order and cannot deadlock
+    missing = sorted(name for name in names if name not in by_name)
+    if missing:
+        # the unique (user, name) constraint is the conflict target, the
+        # ids of the inserted rows are not returned when ignoring conflicts
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        by_name.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+    return by_name
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin keeping only the fields passed in `fields`."""
+
+    def __init__(self, *args, **kwargs):
+        # fields=None (the default) keeps all the fields
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredients"""
     class Meta:
@@ -28,7 +76,76 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class IngredientUsageSerializer(IngredientSerializer):
+    """Serializer for ingredients with the number of their recipes."""
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
+class TagUsageSerializer(TagSerializer):
+    """Serializer for tags with the number of their recipes."""
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
+class RecipeBulkCreateSerializer(serializers.ListSerializer):
+    """List serializer creating many recipes with batched inserts."""
+
+    def _link(self, through, field_name, user, recipes, related_data):
+        """Link the recipes to their tags/ingredients with one insert."""
+        names = [item['name'] for items in related_data for item in items]
+        by_name = get_or_create_by_name(
+            through._meta.get_field(field_name).related_model, user, names,
+        )
+        through.objects.bulk_create(
+            through(recipe=recipe, **{field_name: by_name[name]})
+            for recipe, items in zip(recipes, related_data)
+            # the same name twice is linked only once, just like add()
+            for name in dict.fromkeys(item['name'] for item in items)
+        )
+
+    def create(self, validated_data):
+        """Create all the recipes."""
+        if not validated_data:
+            return []
+        # the user is passed to save(), so it is the same for all of them
+        user = validated_data[0]['user']
+        tags_data = [attrs.pop('tags', []) for attrs in validated_data]
+        ingredients_data = [
+            attrs.pop('ingredients', []) for attrs in validated_data
+        ]
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                Recipe(**attrs) for attrs in validated_data
+            )
+            self._link(Recipe.tags.through, 'tag', user, recipes, tags_data)
+            self._link(
+                Recipe.ingredients.through,
+                'ingredient',
+                user,
+                recipes,
+                ingredients_data,
+            )
+            # bulk_create sends no signals, so the recipes and the cache
+            # are refreshed here, once for the whole batch
+            recipe_ids = [recipe.id for recipe in recipes]
+            recipes_changed(recipe_ids)
+            user_data_changed(user.id)
+
+        # loaded again for the response, in the order they were sent
+        return list(
+            Recipe.objects.filter(
+                pk__in=recipe_ids,
+            ).order_by('id').prefetch_related('tags', 'ingredients')
+        )
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     # adding the tags, many = True indicates this will be list
     # required = False - just indicating this will not be arequired filed
@@ -46,8 +163,12 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'link',
                   'tags',
                   'ingredients',
+                  # shown until the image loads, empty without one
+                  'image_placeholder',
                   ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'image_placeholder']
+        # used when a list of recipes is created at once
+        list_serializer_class = RecipeBulkCreateSerializer
 
     def _get_or_create_tags(self, tags_data, recipe):
         """Handling getting or creating tags as needed."""
@@ -57,11 +178,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         # auth_user = self.context['request'].user
         # the upper would be required if we wouldent
         # pass the user in the valid_data
-        for tag_data in tags_data:
-            # creating or getting a tag if it already exists
-            tag, _ = Tag.objects.get_or_create(user=recipe.user, **tag_data)
-            # adding the tag to the recipe
-            recipe.tags.add(tag)
+        # all the tags are looked up and created at once, set() then only
+        # writes the difference, one delete for the tags no longer in the
+        # list and one insert for the new ones, the rest stays untouched
+        tags = get_or_create_by_name(
+            Tag, recipe.user, [tag_data['name'] for tag_data in tags_data],
+        )
+        recipe.tags.set(tags.values())
 
     def _get_or_create_ingredients(self, ingredients_data, recipe):
         """Handle getting or creatingingredients as needed."""
@@ -71,11 +194,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         # auth_user = self.context['request'].user
         # the upper would be required if we wouldent
         # pass the user in the valid_data
-        for ingredient_data in ingredients_data:
-            ingredient_obj, _ = Ingredient.objects.get_or_create(
-                user=recipe.user,
-                **ingredient_data)
-            recipe.ingredients.add(ingredient_obj)
+        ingredients = get_or_create_by_name(
+            Ingredient,
+            recipe.user,
+            [ingredient_data['name'] for ingredient_data in ingredients_data],
+        )
+        recipe.ingredients.set(ingredients.values())
 
     # we have to add this method bc nested serializers are read only by default
     # so here we will add the functionality that they can be writable
@@ -111,15 +235,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('ingredients', None)
 
         if tags_data is not None:
-            # clearing all the existing tags first
-            # if we are supose to update them
-            instance.tags.clear()
+            # replacing the tags if we are supose to update them, only the
+            # tags that were added or removed are written
             self._get_or_create_tags(tags_data, instance)
 
         if ingredients_data is not None:
-            # clearing all the existing ingredients first
-            # if we are supose to update them
-            instance.ingredients.clear()
+            # same for the ingredients
             self._get_or_create_ingredients(ingredients_data, instance)
 
         # basiacly evrerything except the tags we will asign to our
@@ -127,20 +248,219 @@ class RecipeSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        # saving the updated instace
-        instance.save()
+        # saving only the updated fields, the renditions and the placeholder
+        # are written by the workers meanwhile and the loaded values can
+        # be outdated already
+        instance.save(update_fields=[*validated_data, 'updated_at'])
 
         return instance
 
 
+def image_url(name, request=None):
+    """Return the URL of a stored image, the same as an ImageField."""
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def rendition_urls(renditions, request=None):
+    """Return the URLs of the image renditions, None for the pending."""
+    return {key: image_url(name, request) for key, name in renditions.items()}
+
+
+@extend_schema_field({
+    'type': 'object',
+    'additionalProperties': {
+        'type': 'string', 'format': 'uri', 'nullable': True,
+    },
+    'example': {'128.webp': 'http://example.com/...-128.webp'},
+})
+class ImageRenditionsField(serializers.Field):
+    """Read only field with the URLs of the resized copies of the image,
+    a rendition that is still being generated is null."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return rendition_urls(value, self.context.get('request'))
+
+
 # inheriting from the RecipeSerializer - using it as base
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
+    image = ValidatedImageField(required=False, allow_null=True)
+    image_renditions = ImageRenditionsField()
 
     # inheriting from the RecipeSerializer.Meta - using it as base
     # and adding to th fields the description
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_renditions',
+        ]
+
+
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """List serializer handing all the rows to RecipeReadSerializer."""
+
+    def to_representation(self, data):
+        # the related rows of the whole page are loaded together
+        return self.child.to_representation_many(list(data))
+
+
+class RecipeReadSerializer(serializers.BaseSerializer):
+    """Read only serializer for the recipe list.
+
+    Builds the same output as RecipeSerializer from values() rows of the
+    recipes, the tags and ingredients of all the rows are loaded with one
+    query each. No model instances or nested serializers are created.
+    """
+
+    # same representation of the price as the ModelSerializer would use
+    price_field = serializers.DecimalField(
+        max_digits=Recipe._meta.get_field('price').max_digits,
+        decimal_places=Recipe._meta.get_field('price').decimal_places,
+    )
+
+    class Meta:
+        fields = RecipeSerializer.Meta.fields
+        list_serializer_class = RecipeReadListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_names = [
+            field_name for field_name in self.Meta.fields
+            if fields is None or field_name in fields
+        ]
+
+    def _related(self, through, field_name, recipe_ids):
+        """Return the related {'id', 'name'} items grouped by recipe id."""
+        grouped = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = through.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).order_by('id').values_list(
+            'recipe_id', f'{field_name}_id', f'{field_name}__name',
+        )
+        for recipe_id, related_id, name in rows:
+            grouped[recipe_id].append({'id': related_id, 'name': name})
+        return grouped
+
+    def to_representation_many(self, rows):
+        """Return the representation of all the rows."""
+        recipe_ids = [row['id'] for row in rows]
+        related = {}
+        if 'tags' in self.field_names:
+            related['tags'] = self._related(
+                Recipe.tags.through, 'tag', recipe_ids,
+            )
+        if 'ingredients' in self.field_names:
+            related['ingredients'] = self._related(
+                Recipe.ingredients.through, 'ingredient', recipe_ids,
+            )
+
+        request = self.context.get('request')
+        data = []
+        for row in rows:
+            item = {}
+            for field_name in self.field_names:
+                if field_name in related:
+                    item[field_name] = related[field_name][row['id']]
+                elif field_name == 'price':
+                    item[field_name] = self.price_field.to_representation(
+                        row[field_name]
+                    )
+                elif field_name == 'image':
+                    item[field_name] = image_url(row[field_name], request)
+                elif field_name == 'image_renditions':
+                    item[field_name] = rendition_urls(
+                        row[field_name], request,
+                    )
+                else:
+                    item[field_name] = row[field_name]
+            data.append(item)
+        return data
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+
+class RecipeExportSerializer(RecipeReadSerializer):
+    """Read only serializer for exporting recipes with all the fields of
+    RecipeDetailSerializer."""
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeDetailSerializer.Meta.fields
+
+
+class BulkSelectionSerializer(serializers.Serializer):
+    """Serializer for the ids of the objects of a bulk action."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+    )
+
+
+class RecipeBulkUpdateSerializer(serializers.ModelSerializer):
+    """Serializer for the changes made to many recipes at once."""
+
+    class Meta:
+        model = Recipe
+        # the same value for all the recipes only makes sense for these
+        fields = ['title', 'time_minutes', 'price', 'link', 'description']
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(
+                f'Give at least one of: {", ".join(self.Meta.fields)}.'
+            )
+        return attrs
+
+
+class RenameSerializer(serializers.Serializer):
+    """Serializer for renaming one of many tags or ingredients."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField(max_length=255)
+
+
+class BulkResultSerializer(serializers.Serializer):
+    """Serializer for the result of a bulk action."""
+
+    updated = serializers.IntegerField(required=False)
+    deleted = serializers.IntegerField(required=False)
+
+
+class RecipeAttrStatsSerializer(serializers.Serializer):
+    """Serializer for the number of recipes of a tag or an ingredient."""
+
+    id = serializers.IntegerField(source='pk')
+    name = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+
+
+class StatsSummarySerializer(serializers.Serializer):
+    """Serializer for the average and the median of a recipe field."""
+
+    avg = serializers.FloatField(allow_null=True)
+    median = serializers.FloatField(allow_null=True)
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Serializer for the recipe statistics of a user."""
+
+    recipe_count = serializers.IntegerField()
+    time_minutes = StatsSummarySerializer()
+    price = StatsSummarySerializer()
+    tags = RecipeAttrStatsSerializer(many=True)
+    ingredients = RecipeAttrStatsSerializer(many=True)
+    # when the statistics were computed, None before the first refresh
+    refreshed_at = serializers.DateTimeField(allow_null=True)
 
 
 # we create a separate serializer because when we upload images we only
@@ -151,12 +471,32 @@ class RecipeDetailSerializer(RecipeSerializer):
 # a form data which contains all the form data of a recipe as well as an image
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uplading images to recipes."""
+    # required, only checked from the header of the image
+    image = ValidatedImageField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_renditions']
         # TODO: i think id is not needed here as the model
         # should enforce that, therfore the serializer should
         # enforce this at the id automaticly
         read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+
+
+class ImageResizeSerializer(serializers.Serializer):
+    """Serializer for the size and format of a resized recipe image."""
+    width = serializers.IntegerField(
+        help_text='Width in pixels, one of the supported widths.',
+    )
+    output = serializers.ChoiceField(choices=list(FORMATS), default='webp')
+
+    def validate_width(self, value):
+        # only a known set of sizes, so the cache cannot be filled with
+        # every possible width
+        if value not in settings.RECIPE_IMAGE_RESIZE_WIDTHS:
+            raise serializers.ValidationError(
+                'Has to be one of: '
+                f'{", ".join(map(str, settings.RECIPE_IMAGE_RESIZE_WIDTHS))}.'
+            )
+        return value
@@ -0,0 +1,264 @@
+"""
+Tests for the caching of the recipe API responses.
+"""
+from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import query_budget
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('10.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class CachedListTests(TestCase):
+    """Test the list responses are cached per user."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request is not rebuilt."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res1 = self.client.get(RECIPE_URL)
+        # the cache generation only
+        with query_budget(1):
+            res2 = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+
+    def test_query_params_normalized(self):
+        """Test the order of the query params does not change the key."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        params = f'tags={tag.id}&match=all'
+
+        self.client.get(f'{RECIPE_URL}?{params}')
+        with query_budget(1):
+            self.client.get(f'{RECIPE_URL}?match=all&tags={tag.id}')
+
+        # different params are different responses
+        with query_budget(5):
+            self.client.get(f'{RECIPE_URL}?tags={tag.id}')
+
+    def test_writes_invalidate_cache(self):
+        """Test every kind of write shows up in the next list."""
+        recipe = create_recipe(user=self.user, title='Curry')
+        self.client.get(RECIPE_URL)
+
+        # update through the API
+        self.client.patch(detail_url(recipe.id), {'title': 'Thai Curry'})
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['title'], 'Thai Curry')
+
+        # m2m change made directly
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Dinner')
+
+        # renaming the tag changes the nested representation
+        tag.name = 'Supper'
+        tag.save()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Supper')
+
+        # delete
+        recipe.delete()
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_tags_and_ingredients_invalidated(self):
+        """Test the tag and ingredient lists follow the writes."""
+        self.client.get(TAGS_URL)
+        self.client.get(INGREDIENTS_URL)
+
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.assertEqual(len(self.client.get(TAGS_URL).data), 1)
+        self.assertEqual(len(self.client.get(INGREDIENTS_URL).data), 1)
+
+    def test_cache_separated_per_user(self):
+        """Test the cached responses are never shared between users."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+
+        other_user = create_user(email='other@example.com')
+        self.client.force_authenticate(other_user)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_other_user_writes_keep_cache(self):
+        """Test writes of another user do not invalidate the cache."""
+        self.client.get(TAGS_URL)
+
+        other_user = create_user(email='other@example.com')
+        Tag.objects.create(user=other_user, name='Vegan')
+
+        with query_budget(1):
+            self.client.get(TAGS_URL)
+
+
+class ConditionalRequestTests(TestCase):
+    """Test the conditional GET requests of the recipe endpoints."""
+
+    def setUp(self) -> None:
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        """Test the list returns 304 for a matching ETag without loading
+        the recipes."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertIn('ETag', res.headers)
+        self.assertIn('Last-Modified', res.headers)
+
+        # the cache generation only
+        with query_budget(1):
+            res2 = self.client.get(
+                RECIPE_URL, HTTP_IF_NONE_MATCH=res.headers['ETag'],
+            )
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res2.headers['ETag'], res.headers['ETag'])
+        self.assertEqual(res2.content, b'')
+
+    def test_list_if_modified_since(self):
+        """Test the list returns 304 when not modified since the date."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+
+        res2 = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE=res.headers['Last-Modified'],
+        )
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_by_delete(self):
+        """Test deleting a recipe moves the Last-Modified of the list."""
+        create_recipe(user=self.user)
+        recipe = create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        # the dates are compared in whole seconds
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            data_changed_at=timezone.now() - timedelta(minutes=1),
+        )
+        last_modified = self.client.get(RECIPE_URL).headers['Last-Modified']
+        self.assertNotEqual(last_modified, res.headers['Last-Modified'])
+
+        recipe.delete()
+        res = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_etag_changes(self):
+        """Test the ETag of the list follows changes to the recipes."""
+        recipe = create_recipe(user=self.user)
+        other = create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL).headers['ETag']
+
+        # m2m change
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res.headers['ETag']
+
+        # deletion does not move the newest updated_at
+        other.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        # renaming a tag changes the nested representation
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        etag = self.client.get(RECIPE_URL).headers['ETag']
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_params(self):
+        """Test different pages or filters get different ETags."""
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL).headers['ETag']
+
+        res = self.client.get(
+            RECIPE_URL, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        """Test the detail returns 304 until the recipe changes."""
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)
+        etag = self.client.get(url).headers['ETag']
+
+        with query_budget(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+    def test_detail_of_other_user_not_found(self):
+        """Test the conditional check does not leak other users recipes."""
+        other_user = create_user(email='other@example.com')
+        recipe = create_recipe(user=other_user)
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res.headers)
+
+    def test_detail_invalid_id_not_found(self):
+        """Test an id that is not a number is not found."""
+        res = self.client.get(detail_url('abc'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
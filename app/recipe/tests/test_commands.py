@@ -0,0 +1,158 @@
+"""
+Test custom Django management commands of the recipe app.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from core.models import Recipe
+from core.tests.utils import TempMediaMixin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from PIL import Image
+from recipe.renditions import pending_renditions, rendition_keys
+
+
+class BenchmarkRecipeListTests(TestCase):
+    """Test the benchmark_recipe_list command."""
+
+    def test_benchmark_leaves_no_data(self):
+        """Test the benchmark reports every size and rolls back."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_recipe_list', sizes=[5, 10], repeat=1, stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[2].split()[0], '10')
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class GenerateImagePlaceholdersTests(TempMediaMixin, TestCase):
+    """Test the generate_image_placeholders command."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+
+    def create_recipe(self, content=None):
+        """Create a recipe, with an image of the content if given."""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        if content is not None:
+            recipe.image.save('photo.jpg', ContentFile(content))
+        return recipe
+
+    def test_placeholders_backfilled(self):
+        """Test the images without a placeholder get one."""
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), color='red').save(buffer, 'JPEG')
+        images = [self.create_recipe(buffer.getvalue()) for _ in range(3)]
+        broken = self.create_recipe(b'not an image')
+        without_image = self.create_recipe()
+        generation = self.user.cache_generation
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            'generate_image_placeholders', batch_size=2,
+            stdout=out, stderr=err,
+        )
+
+        self.assertIn(
+            'Generated 3 placeholders, 1 images failed', out.getvalue(),
+        )
+        self.assertIn(broken.image.name, err.getvalue())
+        for recipe in images:
+            recipe.refresh_from_db()
+            self.assertTrue(
+                recipe.image_placeholder.startswith('data:image/webp;')
+            )
+        for recipe in (broken, without_image):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_placeholder, '')
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.cache_generation, generation)
+
+
+class GenerateImageRenditionsTests(TempMediaMixin, TestCase):
+    """Test the generate_image_renditions command."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), color='red').save(buffer, 'JPEG')
+        self.content = buffer.getvalue()
+
+    def create_recipe(self, renditions, age=timedelta(hours=1)):
+        """Create a recipe with an image changed age ago."""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pancakes',
+            time_minutes=5,
+            price=Decimal('5.50'),
+            image_renditions=renditions,
+        )
+        recipe.image.save('photo.jpg', ContentFile(self.content))
+        Recipe.objects.filter(pk=recipe.pk).update(
+            updated_at=timezone.now() - age,
+        )
+        return recipe
+
+    def test_missing_renditions_generated(self):
+        """Test the pending and missing renditions are generated."""
+        # lost with the worker, and uploaded before the renditions
+        lost = self.create_recipe(pending_renditions())
+        older = self.create_recipe({})
+        # still in the queue of a worker
+        queued = self.create_recipe(
+            pending_renditions(), age=timedelta(seconds=10),
+        )
+        out = StringIO()
+
+        call_command('generate_image_renditions', batch_size=1, stdout=out)
+
+        self.assertIn('renditions of 2 images', out.getvalue())
+        for recipe in (lost, older):
+            recipe.refresh_from_db()
+            self.assertEqual(set(recipe.image_renditions), set(
+                rendition_keys()
+            ))
+            self.assertTrue(all(recipe.image_renditions.values()))
+        queued.refresh_from_db()
+        self.assertEqual(queued.image_renditions, pending_renditions())
+
+    def test_failed_renditions_skipped(self):
+        """Test the images whose renditions failed are only retried when
+        asked to."""
+        failed = self.create_recipe({})
+        Recipe.objects.filter(pk=failed.pk).update(
+            image_renditions_failed=True,
+        )
+        out = StringIO()
+
+        call_command('generate_image_renditions', stdout=out)
+
+        self.assertIn('renditions of 0 images', out.getvalue())
+        call_command(
+            'generate_image_renditions', retry_failed=True, stdout=out,
+        )
+        failed.refresh_from_db()
+        self.assertFalse(failed.image_renditions_failed)
+        self.assertEqual(set(failed.image_renditions), set(rendition_keys()))
@@ -0,0 +1,199 @@
+"""
+Tests for the recipe images resized on demand.
+"""
+import os
+import threading
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+from core.models import Recipe
+from core.tests.utils import RecipeMediaMixin, TempMediaMixin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from recipe import image_cache
+from rest_framework import status
+
+
+def image_url(recipe_id):
+    """Create and return a resized image URL."""
+    return reverse('recipe:recipe-image', args=[recipe_id])
+
+
+def image_content(size=(2000, 1000)):
+    """Return the content of a JPEG image."""
+    buffer = BytesIO()
+    Image.new('RGB', size, color='green').save(buffer, format='JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class ImageResizeApiTests(RecipeMediaMixin, TestCase):
+    """Test the image resize API."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe.image.save('photo.jpg', image_content())
+
+    def get_image(self, **params):
+        """Request the resized image and return the response and image."""
+        res = self.client.get(image_url(self.recipe.id), params)
+        if res.status_code != status.HTTP_200_OK:
+            return res, None
+        image = Image.open(BytesIO(b''.join(res.streaming_content)))
+        return res, image
+
+    def test_resize_image(self):
+        """Test getting the image resized to a width and format."""
+        res, image = self.get_image(width=320, output='jpeg')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (320, 160))
+
+        res, image = self.get_image(width=128)
+
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertEqual(image.size, (128, 64))
+
+    def test_image_not_enlarged(self):
+        """Test a width above the original keeps its size."""
+        self.recipe.image.save('small.jpg', image_content((300, 200)))
+
+        res, image = self.get_image(width=1024)
+
+        self.assertEqual(image.size, (300, 200))
+
+    def test_width_not_allowed_error(self):
+        """Test only the whitelisted widths can be requested."""
+        for params in ({'width': 333}, {}, {'width': 128, 'output': 'gif'}):
+            res, _ = self.get_image(**params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_image_of_other_user_not_found(self):
+        """Test the images of other users cannot be requested."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        self.recipe.user = other_user
+        self.recipe.save()
+
+        res, _ = self.get_image(width=128)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipe_without_image_not_found(self):
+        """Test a recipe without an image has nothing to resize."""
+        self.recipe.image = None
+        self.recipe.save()
+
+        res, _ = self.get_image(width=128)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_resized_image_cached(self):
+        """Test the image is resized once and then read from the cache."""
+        with patch(
+            'recipe.image_cache._resize', wraps=image_cache._resize,
+        ) as resize:
+            self.get_image(width=256)
+            res, image = self.get_image(width=256)
+
+        self.assertEqual(resize.call_count, 1)
+        self.assertEqual(image.size, (256, 128))
+
+    def test_resized_image_not_modified(self):
+        """Test the client can revalidate its copy with the ETag."""
+        res, _ = self.get_image(width=256)
+
+        res = self.client.get(
+            image_url(self.recipe.id),
+            {'width': 256},
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ImageCacheTests(TempMediaMixin, TestCase):
+    """Test the disk cache of the resized images."""
+
+    def setUp(self):
+        super().setUp()
+        storage = Recipe._meta.get_field('image').storage
+        self.image_name = storage.save('uploads/recipe/a.jpg', image_content())
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest images are deleted above the size limit."""
+        for width in (64, 128, 256):
+            image_cache.open_resized(self.image_name, width, 'jpeg').close()
+        names = {
+            width: os.path.join(
+                image_cache.cache_dir(),
+                image_cache.cached_name(self.image_name, width, 'jpeg'),
+            )
+            for width in (64, 128, 256)
+        }
+        # 64 was used last, 128 is the least recently used
+        now = time.time()
+        os.utime(names[128], (now - 30, now - 30))
+        os.utime(names[256], (now - 20, now - 20))
+        os.utime(names[64], (now - 10, now - 10))
+        sizes = {width: os.path.getsize(name) for width, name in names.items()}
+
+        with override_settings(
+            RECIPE_IMAGE_CACHE_MAX_BYTES=sizes[64] + sizes[256] + 1,
+        ):
+            image_cache.evict()
+
+        self.assertFalse(os.path.exists(names[128]))
+        self.assertTrue(os.path.exists(names[64]))
+
+    def test_eviction_throttled(self):
+        """Test the cache is not scanned on every miss."""
+        with patch('recipe.image_cache._written', None), patch(
+            'recipe.image_cache.evict',
+        ) as mock_evict:
+            for width in (64, 128, 256):
+                image_cache.open_resized(
+                    self.image_name, width, 'jpeg',
+                ).close()
+            # the first write of the process checks the cache
+            self.assertEqual(mock_evict.call_count, 1)
+
+            # until the writes add up to a share of the limit
+            with override_settings(RECIPE_IMAGE_CACHE_MAX_BYTES=1):
+                image_cache.open_resized(self.image_name, 512, 'jpeg').close()
+            self.assertEqual(mock_evict.call_count, 2)
+
+    def test_concurrent_requests_resize_once(self):
+        """Test concurrent misses for one image collapse into one resize."""
+        resize = image_cache._resize
+
+        def slow_resize(*args):
+            time.sleep(0.2)
+            resize(*args)
+
+        results = []
+
+        def request():
+            with image_cache.open_resized(self.image_name, 512, 'webp') as f:
+                results.append(len(f.read()))
+
+        with patch(
+            'recipe.image_cache._resize', side_effect=slow_resize,
+        ) as mock_resize:
+            threads = [threading.Thread(target=request) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(mock_resize.call_count, 1)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(set(results)), 1)
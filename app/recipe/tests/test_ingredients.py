@@ -2,16 +2,18 @@
 Tests for the ingredients API.
 """
 from core.models import Ingredient, Recipe
+from core.tests.utils import query_budget
 from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
-from recipe.serializers import IngredientSerializer
+from recipe.serializers import IngredientUsageSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+BULK_URL = reverse('recipe:ingredient-bulk-update')
 
 
 def detail_url(ingredient_id):
@@ -57,7 +59,7 @@ class PrivateIngredientsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # checking the data
         ingredients = Ingredient.objects.all().order_by('-name')
-        serializer = IngredientSerializer(ingredients, many=True)
+        serializer = IngredientUsageSerializer(ingredients, many=True)
         self.assertEqual(res.data, serializer.data)
 
     def test_ingredients_limited_to_user(self):
@@ -130,9 +132,10 @@ class PrivateIngredientsApiTests(TestCase):
         # making the request with a parameter
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        # checking data
-        s1 = IngredientSerializer(in1)
-        s2 = IngredientSerializer(in2)
+        # checking data, the count was changed by the database
+        in1.refresh_from_db()
+        s1 = IngredientUsageSerializer(in1)
+        s2 = IngredientUsageSerializer(in2)
         self.assertTrue(res.status_code, status.HTTP_200_OK)
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
@@ -164,3 +167,107 @@ class PrivateIngredientsApiTests(TestCase):
         # checking data
         self.assertTrue(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+    def test_list_ingredients_query_budget(self):
+        """Test listing ingredients runs a constant number of queries."""
+        recipe = Recipe.objects.create(
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=self.user,
+        )
+        for number in range(10):
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Name {number}',
+                )
+            )
+
+        # cache generation and the list itself
+        with query_budget(2):
+            res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_order_ingredients_by_recipe_count(self):
+        """Test listing the least used ingredients first."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {number}',
+                time_minutes=10,
+                price=Decimal('2.50'),
+                user=self.user,
+            )
+            recipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL, {'ordering': 'recipe_count'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['recipe_count']) for item in res.data],
+            [('Pepper', 0), ('Salt', 2)],
+        )
+
+    def test_fuzzy_lookup_ingredients(self):
+        """Test looking up ingredients by name with typos."""
+        tomato = Ingredient.objects.create(user=self.user, name='Tomato')
+        parmesan = Ingredient.objects.create(
+            user=self.user,
+            name='Parmesan cheese',
+        )
+        Ingredient.objects.create(user=self.user, name='Basil')
+        other_user = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other_user, name='Tomato')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'tomatoe'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [tomato.id])
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'parmesan chese'})
+
+        self.assertEqual([item['id'] for item in res.data], [parmesan.id])
+
+    def test_fuzzy_lookup_ingredients_ranked(self):
+        """Test the closest ingredients are returned first."""
+        Ingredient.objects.create(user=self.user, name='Chess nuts')
+        Ingredient.objects.create(user=self.user, name='Cheese')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'chese'})
+
+        names = [item['name'] for item in res.data]
+        self.assertEqual(names, ['Cheese', 'Chess nuts'])
+
+    def test_bulk_delete_ingredients(self):
+        """Test deleting the selected ingredients."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        pepper = Ingredient.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=self.user,
+        )
+        recipe.ingredients.add(salt, pepper)
+
+        res = self.client.delete(BULK_URL, {'ids': [salt.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertEqual(list(recipe.ingredients.all()), [pepper])
+
+    def test_bulk_rename_ingredients(self):
+        """Test renaming many ingredients with one request."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.patch(
+            BULK_URL, [{'id': salt.id, 'name': 'Sea salt'}], format='json',
+        )
+
+        self.assertEqual(res.data, {'updated': 1})
+        salt.refresh_from_db()
+        self.assertEqual(salt.name, 'Sea salt')
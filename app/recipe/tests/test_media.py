@@ -0,0 +1,116 @@
+"""
+Tests for serving the recipe media files.
+"""
+from io import BytesIO
+
+from core.tests.utils import RecipeMediaMixin
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def media_url(name):
+    """Create and return a media file URL."""
+    return reverse('recipe:media', args=[name])
+
+
+def image_content():
+    """Return the content of a JPEG image."""
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20)).save(buffer, format='JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(MEDIA_X_ACCEL_PREFIX='')
+class RecipeMediaApiTests(RecipeMediaMixin, TestCase):
+    """Test the media files are only sent to their owners."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe.image.save('photo.jpg', image_content())
+
+    def test_image_url_served_to_owner(self):
+        """Test the image URL of the recipe sends the file to its owner."""
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+        url = res.data['image']
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(
+            b''.join(res.streaming_content),
+            self.recipe.image.read(),
+        )
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
+
+    def test_rendition_served_to_owner(self):
+        """Test the renditions of the recipe image are sent too."""
+        name = self.recipe.image.storage.save(
+            'uploads/recipe/renditions/photo-128.webp', image_content(),
+        )
+        self.recipe.image_renditions = {'128.webp': name}
+        self.recipe.save()
+
+        res = self.client.get(media_url(name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_media_of_other_user_not_found(self):
+        """Test the files of other users are not sent."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_media_not_found(self):
+        """Test only files used by the recipes can be requested."""
+        for name in ('uploads/recipe/other.jpg', '../../etc/passwd'):
+            res = self.client.get(media_url(name))
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_auth_required(self):
+        """Test the media files need authentication."""
+        res = APIClient().get(media_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(MEDIA_X_ACCEL_PREFIX='/protected-media/')
+    def test_media_sent_by_proxy(self):
+        """Test behind the proxy only the location of the file is sent."""
+        res = self.client.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/{self.recipe.image.name}',
+        )
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_X_ACCEL_PREFIX='/protected-media/')
+    def test_resized_image_sent_by_proxy(self):
+        """Test the resized images are also sent by the proxy."""
+        res = self.client.get(
+            reverse('recipe:recipe-image', args=[self.recipe.id]),
+            {'width': 128},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertTrue(
+            res['X-Accel-Redirect'].startswith('/protected-media/cache/')
+        )
+        self.assertEqual(res.content, b'')
@@ -0,0 +1,169 @@
+"""
+Tests for the read only recipe list serializer.
+"""
+from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import query_budget
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from recipe.serializers import RecipeReadSerializer, RecipeSerializer
+from rest_framework.test import APIClient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+# the recipe columns of the list
+COLUMNS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'image_placeholder',
+]
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('10.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def sorted_related(data):
+    """Return the data with the tags and ingredients sorted by id."""
+    # the prefetch does not guarantee the order of the related objects
+    for item in data:
+        for field_name in ('tags', 'ingredients'):
+            if field_name in item:
+                item[field_name] = sorted(
+                    item[field_name], key=lambda related: related['id'],
+                )
+    return data
+
+
+class RecipeReadSerializerTests(TestCase):
+    """Test RecipeReadSerializer returns the same as RecipeSerializer."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def assert_same_output(self, fields=None):
+        """Assert both serializers return the same list of the recipes."""
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        expected = RecipeSerializer(
+            recipes.prefetch_related('tags', 'ingredients'),
+            many=True,
+            fields=fields,
+        ).data
+        columns = [
+            column for column in COLUMNS
+            if fields is None or column in fields
+        ]
+        result = RecipeReadSerializer(
+            recipes.values('id', *columns),
+            many=True,
+            fields=fields,
+        ).data
+
+        self.assertEqual(
+            sorted_related([dict(item) for item in result]),
+            sorted_related([dict(item) for item in expected]),
+        )
+        return result
+
+    def test_same_output_without_relations(self):
+        """Test recipes without tags and ingredients."""
+        create_recipe(user=self.user, link='https://example.com/r.pdf')
+        create_recipe(user=self.user, title='Empty link', link='')
+
+        self.assert_same_output()
+
+    def test_same_output_prices(self):
+        """Test the prices are formatted the same way."""
+        for price in ['5', '0.5', '0.05', '999.99', '12.30']:
+            create_recipe(user=self.user, price=Decimal(price))
+
+        result = self.assert_same_output()
+
+        self.assertEqual(result[-1]['price'], '5.00')
+
+    def test_same_output_with_relations(self):
+        """Test recipes sharing tags and ingredients."""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Dinner', 'Quick']
+        ]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for number in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.tags.add(*tags[:number])
+            if number % 2:
+                recipe.ingredients.add(salt)
+
+        self.assert_same_output()
+
+    def test_same_output_sparse_fields(self):
+        """Test the requested fields are the same."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        self.assert_same_output(fields={'id', 'title'})
+        self.assert_same_output(fields={'price', 'tags'})
+
+    def test_related_loaded_once(self):
+        """Test the tags and ingredients cost one query each."""
+        for number in range(10):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ingredient {number}',
+                )
+            )
+        rows = list(Recipe.objects.values(*COLUMNS))
+
+        with query_budget(2):
+            data = RecipeReadSerializer(rows, many=True).data
+
+        self.assertEqual(len(data), 10)
+
+    def test_single_row(self):
+        """Test serializing a single row."""
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+        row = Recipe.objects.values(*COLUMNS).get(pk=recipe.pk)
+
+        self.assertEqual(
+            sorted_related([RecipeReadSerializer(row).data]),
+            sorted_related([RecipeSerializer(recipe).data]),
+        )
+
+    def test_list_endpoint_same_output(self):
+        """Test the list endpoint returns what RecipeSerializer returns."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        for number in range(3):
+            recipe = create_recipe(
+                user=self.user,
+                title=f'Vegan curry {number}',
+                price=Decimal(f'{number}.5'),
+            )
+            recipe.tags.add(vegan)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPE_URL, {'search': 'curry'})
+
+        recipes = Recipe.objects.order_by('-id')
+        self.assertEqual(
+            sorted_related(res.data['results']),
+            sorted_related(RecipeSerializer(recipes, many=True).data),
+        )
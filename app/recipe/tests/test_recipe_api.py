@@ -2,9 +2,12 @@
 Test for recipe APis.
 """
 from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import query_budget
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from recipe.serializers import (
     RecipeSerializer,
@@ -12,12 +15,15 @@ from recipe.serializers import (
 )
 from rest_framework import status
 from rest_framework.test import APIClient
+import json
 import os
 from PIL import Image
 import tempfile
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-update')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(recipe_id):
@@ -98,7 +104,7 @@ class PrivateRecipeAPITest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         # data from the response should be equal to serializer data
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipes is limited to authenticated user."""
@@ -124,7 +130,30 @@ class PrivateRecipeAPITest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         # data from the response should be equal to serialized data
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_recipes_query_budget(self):
+        """Test listing recipes runs a constant number of queries."""
+        # every recipe gets its own tags and ingredients, so without
+        # prefetching the number of queries would grow with the recipes
+        for number in range(10):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ingredient {number}',
+                )
+            )
+
+        # cache generation, recipes, tags and ingredients
+        with query_budget(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
 
     def test_get_recipe_detail(self):
         """Test get recipe detail."""
@@ -142,6 +171,27 @@ class PrivateRecipeAPITest(TestCase):
         # checkig if data is correct
         self.assertEqual(res.data, serializer.data)
 
+    def test_get_recipe_detail_query_budget(self):
+        """Test retrieving a recipe runs a constant number of queries."""
+        recipe = create_recipe(user=self.user)
+        for number in range(5):
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ingredient {number}',
+                )
+            )
+
+        # Last-Modified aggregate, recipe, tags and ingredients
+        with query_budget(4):
+            res = self.client.get(detail_url(recipe_id=recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 5)
+
     def test_create_recipe(self):
         """Test creating a recipe with our API."""
 
@@ -281,6 +331,24 @@ class PrivateRecipeAPITest(TestCase):
         # the object should still exit
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
 
+    def test_new_tags_inserted_in_name_order(self):
+        """Test the new names are inserted sorted, so concurrent requests
+        with the same names lock them in the same order."""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Thai'}, {'name': 'Dinner'}, {'name': 'Spicy'}],
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(Tag.objects.order_by('id').values_list('name', flat=True)),
+            ['Dinner', 'Spicy', 'Thai'],
+        )
+
     def test_create_recipe_with_new_tags(self):
         """Test creating a recipe with new tags."""
         # data that will be used to create the recipe with tags
@@ -434,6 +502,57 @@ class PrivateRecipeAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def tag_link_writes(self, queries):
+        """Return the writes to the recipe tags table."""
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith(
+                ('INSERT INTO "core_recipe_tags"',
+                 'DELETE FROM "core_recipe_tags"'),
+            )
+        ]
+
+    def test_update_recipe_tags_writes_only_changes(self):
+        """Test replacing one tag out of many keeps the other links."""
+        recipe = create_recipe(user=self.user)
+        for number in range(20):
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+        links = Recipe.tags.through.objects.filter(recipe=recipe)
+        kept_links = set(links.exclude(tag__name='Tag 0').values_list('id'))
+        names = [f'Tag {number}' for number in range(1, 20)] + ['New']
+        payload = {'tags': [{'name': name} for name in names]}
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # one delete for the removed tag and one insert for the new one
+        writes = self.tag_link_writes(context.captured_queries)
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(
+            set(links.values_list('tag__name', flat=True)), set(names),
+        )
+        self.assertTrue(kept_links <= set(links.values_list('id')))
+
+    def test_update_recipe_same_tags_no_writes(self):
+        """Test sending the current tags again does not write any links."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                {'tags': [{'name': 'Dinner'}]},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tag_link_writes(context.captured_queries), [])
+
     def test_creating_recipe_with_new_ingredients(self):
         """Test creating a recipe with new ingredients."""
         # craeting test data
@@ -583,9 +702,9 @@ class PrivateRecipeAPITest(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertTrue(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients"""
@@ -608,9 +727,520 @@ class PrivateRecipeAPITest(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertTrue(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_without_distinct(self):
+        """Test filtering by tags runs as a semi join without DISTINCT."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        with query_budget(5) as context:
+            res = self.client.get(RECIPE_URL, params)
+
+        # the recipe carrying both tags is still returned only once
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        recipes_query = next(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT "core_recipe"')
+        )
+        self.assertIn('EXISTS', recipes_query)
+        self.assertNotIn('DISTINCT', recipes_query)
+
+    def test_filter_by_tags_match_all(self):
+        """Test filtering recipes carrying every listed tag."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        r1 = create_recipe(user=self.user, title='Vegan Dinner')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='Vegan Breakfast')
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_tags_and_ingredients_match_all(self):
+        """Test match all applies to both tags and ingredients."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        in1 = Ingredient.objects.create(user=self.user, name='Rice')
+        in2 = Ingredient.objects.create(user=self.user, name='Beans')
+        r1 = create_recipe(user=self.user, title='Rice and Beans')
+        r1.tags.add(tag)
+        r1.ingredients.add(in1, in2)
+        r2 = create_recipe(user=self.user, title='Rice Bowl')
+        r2.tags.add(tag)
+        r2.ingredients.add(in1)
+        r3 = create_recipe(user=self.user, title='Beans and Rice Salad')
+        r3.ingredients.add(in1, in2)
+
+        params = {
+            'tags': f'{tag.id}',
+            # listing the same id twice should not matter
+            'ingredients': f'{in1.id},{in2.id},{in2.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPE_URL, params)
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_invalid_match_error(self):
+        """Test an unknown match mode returns an error."""
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """Test searching recipes by title, description, tags and
+        ingredients."""
+        r1 = create_recipe(user=self.user, title='Thai Green Curry')
+        r2 = create_recipe(
+            user=self.user,
+            title='Rice bowl',
+            description='Served with a mild curry sauce',
+        )
+        r3 = create_recipe(user=self.user, title='Pancakes')
+        r3.tags.add(Tag.objects.create(user=self.user, name='Curry'))
+        r4 = create_recipe(user=self.user, title='Chicken')
+        r4.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Curry paste')
+        )
+        create_recipe(user=self.user, title='Fish and Chips')
+        other_user = create_user(email='other@example.com', password='pw1234')
+        create_recipe(user=other_user, title='Red Curry')
+
+        res = self.client.get(RECIPE_URL, {'search': 'curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        # the title match ranks first, the description match second
+        self.assertEqual(ids[:2], [r1.id, r2.id])
+        self.assertCountEqual(ids, [r1.id, r2.id, r3.id, r4.id])
+
+    def test_search_recipes_paginated(self):
+        """Test search results can be paginated by rank."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Curry {number}')
+            for number in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'search': 'curry', 'page_size': 2})
+        seen = [recipe['id'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [recipe['id'] for recipe in res.data['results']]
+
+        # same rank for every recipe, the newest come first
+        self.assertEqual(seen, [recipe.id for recipe in reversed(recipes)])
+
+    def test_recipes_paginated_with_cursor(self):
+        """Test walking through the recipe list page by page."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {number}')
+            for number in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the paginated response does not count all the rows
+        self.assertNotIn('count', res.data)
+        self.assertIsNone(res.data['previous'])
+        # following the next links returns every recipe once,
+        # newest first
+        seen = [recipe['id'] for recipe in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertLessEqual(len(res.data['results']), 2)
+            seen += [recipe['id'] for recipe in res.data['results']]
+
+        expected = [recipe.id for recipe in reversed(recipes)]
+        self.assertEqual(seen, expected)
+
+    def test_recipes_pages_run_constant_queries(self):
+        """Test a later page costs the same number of queries as the first.
+        """
+        for number in range(6):
+            create_recipe(user=self.user, title=f'Recipe {number}')
+
+        with query_budget(5):
+            res = self.client.get(RECIPE_URL, {'page_size': 2})
+        with query_budget(5) as context:
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the page is found by position and not with OFFSET or COUNT
+        for query in context.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_recipes_cursor_keeps_filters(self):
+        """Test the cursor links keep the tags filter applied."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tagged = []
+        for number in range(4):
+            recipe = create_recipe(user=self.user, title=f'Vegan {number}')
+            recipe.tags.add(tag)
+            tagged.append(recipe.id)
+            # recipes without the tag in between the tagged ones
+            create_recipe(user=self.user, title=f'Other {number}')
+
+        params = {'tags': f'{tag.id}', 'page_size': 3}
+        res = self.client.get(RECIPE_URL, params)
+        seen = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        seen += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(seen, list(reversed(tagged)))
+
+    def test_recipes_ordering_by_id(self):
+        """Test the recipes can be paginated oldest first."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {number}')
+            for number in range(3)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'id', 'page_size': 2})
+        seen = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        seen += [recipe['id'] for recipe in res.data['results']]
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+
+    def test_list_sparse_fields(self):
+        """Test listing only the requested fields skips the m2m queries."""
+        for number in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+
+        # cache generation and recipes
+        with query_budget(2) as context:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'][0], {'id': recipe.id, 'title': 'Recipe 2'},
+        )
+        recipe_query = next(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT "core_recipe"."id", ')
+        )
+        self.assertNotIn('"core_recipe"."price"', recipe_query)
+        self.assertNotIn('"core_recipe"."description"', recipe_query)
+
+    def test_list_sparse_fields_with_tags(self):
+        """Test only the requested relations are prefetched."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        # cache generation, recipes and tags
+        with query_budget(3):
+            res = self.client.get(RECIPE_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Vegan')
+        self.assertNotIn('ingredients', res.data['results'][0])
+
+    def test_detail_sparse_fields(self):
+        """Test retrieving a recipe with only the requested fields."""
+        recipe = create_recipe(user=self.user, description='Long text')
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+        # Last-Modified aggregate and recipe
+        with query_budget(2):
+            res = self.client.get(
+                detail_url(recipe.id), {'fields': 'id,description'},
+            )
+
+        self.assertEqual(
+            res.data, {'id': recipe.id, 'description': 'Long text'},
+        )
+
+    def test_sparse_fields_unknown_error(self):
+        """Test requesting a field that does not exist returns an error."""
+        res = self.client.get(RECIPE_URL, {'fields': 'title,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('user', res.data['fields'])
+
+    def test_sparse_fields_ignored_on_update(self):
+        """Test the fields param does not trim the update response."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(
+            f'{detail_url(recipe.id)}?fields=id', {'title': 'New title'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'New title')
+
+    def test_create_recipe_tags_constant_queries(self):
+        """Test the tags of a new recipe are resolved all at once."""
+        Tag.objects.create(user=self.user, name='Existing')
+
+        def payload(count):
+            tags = [{'name': 'Existing'}]
+            tags += [{'name': f'Tag {number}'} for number in range(count)]
+            return {
+                'title': 'Curry',
+                'time_minutes': 30,
+                'price': '8.25',
+                'tags': tags,
+            }
+
+        with CaptureQueriesContext(connection) as one_new:
+            self.client.post(RECIPE_URL, payload(1), format='json')
+        Tag.objects.exclude(name='Existing').delete()
+
+        with query_budget(len(one_new)):
+            res = self.client.post(RECIPE_URL, payload(20), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), 21)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 21)
+
+    def bulk_payload(self, count):
+        """Return a list of recipes sharing some tags and ingredients."""
+        return [
+            {
+                'title': f'Curry {number}',
+                'time_minutes': 30,
+                'price': '8.25',
+                'tags': [{'name': 'Dinner'}, {'name': f'Tag {number}'}],
+                'ingredients': [{'name': 'Rice'}, {'name': 'Rice'}],
+            }
+            for number in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes in one request."""
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.post(RECIPE_URL, self.bulk_payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data],
+            ['Curry 0', 'Curry 1', 'Curry 2'],
+        )
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(recipes.count(), 3)
+        # the existing tag is reused and the new names created once
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        for recipe in recipes:
+            self.assertIn(dinner, recipe.tags.all())
+            self.assertEqual(recipe.ingredients.count(), 1)
+            self.assertEqual(recipe.user, self.user)
+        # the derived data is up to date without any signals
+        res = self.client.get(RECIPE_URL, {'search': 'rice'})
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_bulk_create_constant_queries(self):
+        """Test the number of queries does not grow with the batch."""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(RECIPE_URL, self.bulk_payload(2), format='json')
+        Recipe.objects.all().delete()
+
+        # every recipe brings a new tag
+        with query_budget(len(small)):
+            res = self.client.post(
+                RECIPE_URL, self.bulk_payload(30), format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 30)
+
+    def test_bulk_create_invalid_creates_nothing(self):
+        """Test one invalid recipe rejects the whole list."""
+        payload = self.bulk_payload(3)
+        del payload[1]['title']
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_create_empty_error(self):
+        """Test an empty list is rejected."""
+        res = self.client.post(RECIPE_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """Test updating the listed recipes of the user at once."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {number}')
+            for number in range(3)
+        ]
+        other_recipe = create_recipe(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+        payload = {
+            'ids': [recipes[0].id, recipes[1].id, other_recipe.id],
+            'time_minutes': 5,
+            'description': 'Quick lunch',
+        }
+
+        # savepoint, selection, update, search vectors, cache generation
+        # and the release of the savepoint
+        with query_budget(6):
+            res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 2})
+        for recipe in recipes:
+            recipe.refresh_from_db()
+        self.assertEqual([recipe.time_minutes for recipe in recipes],
+                         [5, 5, 22])
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.time_minutes, 22)
+        self.assertEqual(
+            set(Recipe.objects.filter(search_vector='lunch')),
+            set(recipes[:2]),
+        )
+
+    def test_bulk_update_recipes_by_filter(self):
+        """Test updating the recipes matching the list filters."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tagged = create_recipe(user=self.user)
+        tagged.tags.add(tag)
+        untagged = create_recipe(user=self.user)
+
+        res = self.client.patch(
+            f'{BULK_URL}?tags={tag.id}', {'price': '1.50'}, format='json',
+        )
+
+        self.assertEqual(res.data, {'updated': 1})
+        tagged.refresh_from_db()
+        untagged.refresh_from_db()
+        self.assertEqual(tagged.price, Decimal('1.50'))
+        self.assertEqual(untagged.price, Decimal('10.25'))
+
+    def test_bulk_update_invalid_requests(self):
+        """Test a bulk update needs changes and a selection."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(BULK_URL, {'ids': [recipe.id]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(BULK_URL, {'time_minutes': 1}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.time_minutes, 22)
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting many recipes without loading them."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipes = []
+        for number in range(10):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.tags.add(tag)
+            recipes.append(recipe)
+        other_recipe = create_recipe(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+        ids = [recipe.id for recipe in recipes[:8]] + [other_recipe.id]
+
+        # savepoint, selection, image files, two through tables, recipes,
+        # cache generation and the release of the savepoint
+        with query_budget(8) as context:
+            res = self.client.delete(BULK_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 8})
+        self.assertEqual(
+            list(Recipe.objects.order_by('id')),
+            recipes[8:] + [other_recipe],
+        )
+        self.assertEqual(tag.recipe_set.count(), 2)
+        for query in context.captured_queries:
+            self.assertNotIn('"core_recipe"."title"', query['sql'])
+
+    def export(self, params=None):
+        """Return the status and the parsed lines of an export."""
+        res = self.client.get(EXPORT_URL, params)
+        self.assertTrue(res.streaming)
+        content = b''.join(res.streaming_content).decode()
+        return res, [json.loads(line) for line in content.splitlines()]
+
+    def test_export_recipes(self):
+        """Test exporting the recipes of the user as NDJSON."""
+        recipes = []
+        for number in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+            recipes.append(recipe)
+        recipes[0].image = 'uploads/recipe/example.jpg'
+        recipes[0].save()
+        create_recipe(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+
+        res, items = self.export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment', res['Content-Disposition'])
+        # the same absolute image URL as in the detail response
+        request = RequestFactory().get(EXPORT_URL)
+        expected = [
+            RecipeDetailSerializer(recipe, context={'request': request}).data
+            for recipe in reversed(recipes)
+        ]
+        self.assertEqual(items, json.loads(json.dumps(expected)))
+        self.assertTrue(items[-1]['image'].startswith('http://testserver/'))
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_reads_chunks(self):
+        """Test the related rows are loaded once per chunk of recipes."""
+        for number in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {number}')
+            recipe.ingredients.add(
+                Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ingredient {number}',
+                )
+            )
+
+        with CaptureQueriesContext(connection) as context:
+            res, items = self.export()
+
+        self.assertEqual(len(items), 5)
+        ingredient_queries = [
+            query for query in context.captured_queries
+            if 'FROM "core_recipe_ingredients"' in query['sql']
+        ]
+        self.assertEqual(len(ingredient_queries), 3)
+
+    def test_export_sparse_fields_and_filters(self):
+        """Test the export takes the fields and the list filters."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user, title='Vegan curry')
+        recipe.tags.add(tag)
+        create_recipe(user=self.user, title='Steak')
+
+        res, items = self.export({'fields': 'id,title', 'tags': tag.id})
+
+        self.assertEqual(items, [{'id': recipe.id, 'title': 'Vegan curry'}])
 
 
 class ImageUploadTest(TestCase):
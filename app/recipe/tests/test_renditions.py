@@ -0,0 +1,246 @@
+"""
+Tests for the renditions of the recipe images.
+"""
+import base64
+import os
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from core.models import Recipe
+from core.tests.utils import RecipeMediaMixin
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from recipe.renditions import generate_renditions, rendition_keys
+from recipe.serializers import RecipeDetailSerializer
+from recipe.views import RecipeViewSet
+from rest_framework import status
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_file(size=(2000, 1000), image_format='JPEG'):
+    """Create and return a temporary image file."""
+    file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', size, color='red').save(file, format=image_format)
+    file.seek(0)
+    return file
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class RenditionTests(RecipeMediaMixin, TestCase):
+    """Test generating the renditions of the recipe images."""
+
+    def upload(self, **kwargs):
+        """Upload an image to the recipe."""
+        with image_file(**kwargs) as file:
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': file},
+                format='multipart',
+            )
+
+    def test_renditions_pending_until_generated(self):
+        """Test the renditions are pending until the upload commits."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['image_renditions'],
+            dict.fromkeys(rendition_keys()),
+        )
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        renditions = res.data['image_renditions']
+        self.assertEqual(set(renditions), set(rendition_keys()))
+        self.assertTrue(all(
+            url.startswith('http://testserver/') for url in renditions.values()
+        ))
+
+    def test_rendition_sizes_and_formats(self):
+        """Test the renditions keep the aspect ratio and the format."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(size=(2000, 1000))
+
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        names = self.recipe.image_renditions
+        with Image.open(storage.path(names['1024.webp'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (1024, 512))
+        with Image.open(storage.path(names['128.jpeg'])) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (128, 64))
+
+    def test_small_image_not_enlarged(self):
+        """Test an image smaller than a rendition is not enlarged."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(size=(300, 200), image_format='PNG')
+
+        self.recipe.refresh_from_db()
+        name = self.recipe.image_renditions['1024.jpeg']
+        with Image.open(self.recipe.image.storage.path(name)) as image:
+            self.assertEqual(image.size, (300, 200))
+
+    def test_replaced_image_keeps_new_renditions(self):
+        """Test late renditions of a replaced image are thrown away."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.upload()
+        self.recipe.refresh_from_db()
+        old_image = self.recipe.image.name
+        with self.captureOnCommitCallbacks():
+            self.upload()
+
+        # the worker of the first upload finishes last
+        callbacks[0]()
+
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, old_image)
+        self.assertEqual(
+            self.recipe.image_renditions,
+            dict.fromkeys(rendition_keys()),
+        )
+        renditions_dir = os.path.join(
+            self.media_root, 'uploads/recipe/renditions',
+        )
+        stem = os.path.splitext(os.path.basename(old_image))[0]
+        self.assertFalse(any(
+            name.startswith(stem) for name in os.listdir(renditions_dir)
+        ))
+
+    def test_update_keeps_renditions_of_worker(self):
+        """Test saving a recipe loaded before the renditions were
+        generated keeps them."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.upload()
+        self.recipe.refresh_from_db()
+
+        # the worker finishes while the recipe is being updated
+        callbacks[0]()
+        serializer = RecipeDetailSerializer(
+            self.recipe, data={'title': 'Waffles'}, partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Waffles')
+        self.assertEqual(set(self.recipe.image_renditions), set(
+            rendition_keys()
+        ))
+        self.assertNotIn(None, self.recipe.image_renditions.values())
+
+    def test_unreadable_image_gets_no_renditions(self):
+        """Test an image Pillow cannot read ends with no renditions."""
+        self.recipe.image.save('broken.jpg', ContentFile(b'not an image'))
+
+        with self.assertLogs('recipe.renditions', level='ERROR'):
+            generate_renditions(
+                self.recipe.id, self.user.id, self.recipe.image.name,
+            )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, {})
+        self.assertEqual(self.recipe.image_placeholder, '')
+        self.assertTrue(self.recipe.image_renditions_failed)
+
+    def test_new_image_clears_failure(self):
+        """Test a new upload of a recipe whose renditions failed gets
+        them generated."""
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_renditions_failed=True,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload()
+
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image_renditions_failed)
+        self.assertNotIn(None, self.recipe.image_renditions.values())
+
+    def test_renditions_invalidate_cached_responses(self):
+        """Test the finished renditions change the ETag of the recipe."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.upload()
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        callbacks[0]()
+
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_placeholder_in_list(self):
+        """Test the list embeds a tiny placeholder of the image."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(size=(2000, 1000))
+
+        res = self.client.get(RECIPES_URL)
+
+        placeholder = res.data['results'][0]['image_placeholder']
+        prefix = 'data:image/webp;base64,'
+        self.assertTrue(placeholder.startswith(prefix))
+        self.assertLess(len(placeholder), 1024)
+        content = base64.b64decode(placeholder[len(prefix):])
+        with Image.open(BytesIO(content)) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (16, 8))
+
+    def test_new_image_clears_placeholder(self):
+        """Test the placeholder of a replaced image is not shown."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload()
+        with self.captureOnCommitCallbacks():
+            res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_placeholder, '')
+
+    def test_patch_keeps_placeholder(self):
+        """Test a PATCH racing the worker keeps the placeholder and the
+        renditions it generated."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.upload()
+        get_object = RecipeViewSet.get_object
+
+        def get_object_then_generate(view):
+            # the worker finishes after the view loaded the recipe
+            recipe = get_object(view)
+            callbacks[0]()
+            return recipe
+
+        with patch.object(
+            RecipeViewSet, 'get_object', get_object_then_generate,
+        ):
+            res = self.client.patch(
+                detail_url(self.recipe.id), {'title': 'Crepes'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Crepes')
+        self.assertTrue(self.recipe.image_placeholder.startswith('data:'))
+        self.assertEqual(set(self.recipe.image_renditions), set(
+            rendition_keys()
+        ))
+        self.assertNotIn(None, self.recipe.image_renditions.values())
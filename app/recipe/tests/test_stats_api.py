@@ -0,0 +1,116 @@
+"""
+Tests for the recipe statistics API.
+"""
+from core.models import Ingredient, Recipe, Tag
+from core.tests.utils import query_budget
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from io import StringIO
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+STATS_URL = reverse('recipe:stats')
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('10.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def refresh_stats():
+    """Refresh the materialized views of the statistics."""
+    call_command('refresh_recipe_stats', stdout=StringIO())
+
+
+class PublicStatsApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required for the statistics."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stats_before_refresh(self):
+        """Test the statistics are empty until the views are refreshed."""
+        create_recipe(user=self.user)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['price']['median'])
+        self.assertIsNone(res.data['refreshed_at'])
+
+    def test_stats(self):
+        """Test the counts, averages, medians and most used items."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for minutes, price in [(10, '1.00'), (20, '2.00'), (60, '9.00')]:
+            recipe = create_recipe(
+                user=self.user, time_minutes=minutes, price=Decimal(price),
+            )
+            recipe.tags.add(vegan)
+            recipe.ingredients.add(salt)
+        recipe.tags.add(dinner)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+        )
+        create_recipe(user=other_user, price=Decimal('500'))
+        refresh_stats()
+
+        # user statistics, tags and ingredients
+        with query_budget(3):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['time_minutes'], {'avg': 30, 'median': 20})
+        self.assertEqual(res.data['price'], {'avg': 4, 'median': 2})
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Vegan', 3), ('Dinner', 1)],
+        )
+        self.assertEqual(
+            res.data['ingredients'],
+            [{'id': salt.id, 'name': 'Salt', 'recipe_count': 3}],
+        )
+        self.assertIsNotNone(res.data['refreshed_at'])
+
+    def test_stats_limit(self):
+        """Test limiting the number of the most used tags."""
+        recipe = create_recipe(user=self.user)
+        for number in range(3):
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {number}')
+            )
+        refresh_stats()
+
+        res = self.client.get(STATS_URL, {'limit': 2})
+        self.assertEqual(len(res.data['tags']), 2)
+
+        res = self.client.get(STATS_URL, {'limit': -1})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
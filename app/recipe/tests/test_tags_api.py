@@ -2,16 +2,20 @@
 Tests for the tags API.
 """
 from core.models import Recipe, Tag
+from core.tests.utils import query_budget
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import TestCase
-from recipe.serializers import TagSerializer
+from recipe.serializers import TagUsageSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
 
 
 TAGS_URL = reverse('recipe:tag-list')
+BULK_URL = reverse('recipe:tag-bulk-update')
 
 
 def detail_url(tag_id):
@@ -59,7 +63,7 @@ class PrivateTagsApiTests(TestCase):
         # we specify theorder bc by using different version
         # of the default databse we might have different order
         tags = Tag.objects.all().order_by('-name')
-        serializer = TagSerializer(tags, many=True)
+        serializer = TagUsageSerializer(tags, many=True)
         # runnign the test if the data is as expected
         self.assertEqual(res.data, serializer.data)
 
@@ -99,6 +103,17 @@ class PrivateTagsApiTests(TestCase):
         # ceckingactualy the data
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_existing_name_error(self):
+        """Test renaming a tag to a name the user has already fails."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='Default tag')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Default tag')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name="Breakfast")
@@ -126,9 +141,10 @@ class PrivateTagsApiTests(TestCase):
         # making the request with the params
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        # checking data
-        s1 = TagSerializer(tag1)
-        s2 = TagSerializer(tag2)
+        # checking data, the count was changed by the database
+        tag1.refresh_from_db()
+        s1 = TagUsageSerializer(tag1)
+        s2 = TagUsageSerializer(tag2)
         self.assertTrue(res.status_code, status.HTTP_200_OK)
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
@@ -158,3 +174,219 @@ class PrivateTagsApiTests(TestCase):
         # checking data
         self.assertTrue(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+    def test_list_tags_query_budget(self):
+        """Test listing tags runs a constant number of queries."""
+        recipe = Recipe.objects.create(
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=self.user,
+        )
+        for number in range(10):
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Name {number}')
+            )
+
+        # cache generation and the list itself
+        with query_budget(2):
+            res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_assigned_only_without_join(self):
+        """Test assigned_only filters on the count, not the recipes."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('core_tag', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_order_tags_by_recipe_count(self):
+        """Test listing the most used tags first."""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Lunch')
+        ]
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                title=f'Recipe {number}',
+                time_minutes=10,
+                price=Decimal('2.50'),
+                user=self.user,
+            )
+            recipe.tags.add(*tags[:number + 1])
+
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['recipe_count']) for item in res.data],
+            [('Vegan', 3), ('Dessert', 2), ('Lunch', 1)],
+        )
+
+    def test_fuzzy_lookup_tags(self):
+        """Test looking up tags by name with typos."""
+        tomato = Tag.objects.create(user=self.user, name='Tomato')
+        parmesan = Tag.objects.create(
+            user=self.user,
+            name='Parmesan cheese',
+        )
+        Tag.objects.create(user=self.user, name='Basil')
+        other_user = create_user(email='other@example.com')
+        Tag.objects.create(user=other_user, name='Tomato')
+
+        res = self.client.get(TAGS_URL, {'q': 'tomatoe'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [tomato.id])
+
+        res = self.client.get(TAGS_URL, {'q': 'parmesan chese'})
+
+        self.assertEqual([item['id'] for item in res.data], [parmesan.id])
+
+    def test_fuzzy_lookup_tags_ranked(self):
+        """Test the closest tags are returned first."""
+        Tag.objects.create(user=self.user, name='Chess nuts')
+        Tag.objects.create(user=self.user, name='Cheese')
+
+        res = self.client.get(TAGS_URL, {'q': 'chese'})
+
+        names = [item['name'] for item in res.data]
+        self.assertEqual(names, ['Cheese', 'Chess nuts'])
+
+    def test_bulk_rename_tags(self):
+        """Test renaming many tags with one request."""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=self.user,
+        )
+        recipe.tags.add(vegan)
+        other_tag = Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Other',
+        )
+        payload = [
+            {'id': vegan.id, 'name': 'Plant based'},
+            {'id': lunch.id, 'name': 'Brunch'},
+            {'id': other_tag.id, 'name': 'Mine'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 2})
+        self.assertEqual(
+            set(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True,
+            )),
+            {'Plant based', 'Brunch'},
+        )
+        other_tag.refresh_from_db()
+        self.assertEqual(other_tag.name, 'Other')
+        # the recipes using the tags are refreshed too
+        self.assertTrue(
+            Recipe.objects.filter(search_vector='plant').exists()
+        )
+
+    def test_bulk_rename_other_user_tag_ignored(self):
+        """Test the tags of other users and their recipes are untouched."""
+        other_user = create_user(email='other@example.com')
+        other_tag = Tag.objects.create(user=other_user, name='Other')
+        recipe = Recipe.objects.create(
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=other_user,
+        )
+        recipe.tags.add(other_tag)
+        recipe.refresh_from_db()
+
+        res = self.client.patch(
+            BULK_URL, [{'id': other_tag.id, 'name': 'Mine'}], format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 0})
+        other_tag.refresh_from_db()
+        self.assertEqual(other_tag.name, 'Other')
+        updated_at = recipe.updated_at
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.updated_at, updated_at)
+
+    def test_bulk_rename_existing_name_error(self):
+        """Test a rename to a name the user has rejects all renames."""
+        Tag.objects.create(user=self.user, name='Vegan')
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+
+        res = self.client.patch(
+            BULK_URL, [{'id': lunch.id, 'name': 'Vegan'}], format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        lunch.refresh_from_db()
+        self.assertEqual(lunch.name, 'Lunch')
+
+    def test_bulk_delete_tags(self):
+        """Test deleting the selected tags without loading them."""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {number}')
+            for number in range(5)
+        ]
+        recipe = Recipe.objects.create(
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.50'),
+            user=self.user,
+        )
+        recipe.tags.add(*tags)
+        other_tag = Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Other',
+        )
+        ids = [tag.id for tag in tags[:3]] + [other_tag.id]
+
+        # savepoint, selection, recipes, links, tags, refresh of the
+        # recipes, cache generation and the release of the savepoint
+        with query_budget(8) as context:
+            res = self.client.delete(BULK_URL, {'ids': ids}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 3})
+        self.assertEqual(
+            list(recipe.tags.order_by('id')), tags[3:],
+        )
+        self.assertTrue(Tag.objects.filter(id=other_tag.id).exists())
+        # no tag was loaded
+        for query in context.captured_queries:
+            self.assertNotIn('"core_tag"."name"', query['sql'])
+
+    def test_bulk_delete_tags_by_filter(self):
+        """Test deleting the tags matching the fuzzy lookup."""
+        Tag.objects.create(user=self.user, name='Tomato')
+        Tag.objects.create(user=self.user, name='Basil')
+
+        res = self.client.delete(f'{BULK_URL}?q=tomatoe')
+
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertEqual(
+            list(Tag.objects.values_list('name', flat=True)), ['Basil'],
+        )
+
+    def test_bulk_delete_without_selection_error(self):
+        """Test a bulk delete needs the ids or a filter."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.delete(BULK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Tag.objects.exists())
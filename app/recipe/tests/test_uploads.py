@@ -0,0 +1,133 @@
+"""
+Tests for the validation of the uploaded recipe images.
+"""
+import os
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from core.models import Recipe
+from core.tests.utils import RecipeMediaMixin
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_upload(size=(20, 10), image_format='JPEG', name='photo.jpg'):
+    """Return an uploaded image file."""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageUploadValidationTests(RecipeMediaMixin, TestCase):
+    """Test the uploaded images are validated from their header."""
+
+    def upload(self, file):
+        """Upload the file as the image of the recipe."""
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': file},
+            format='multipart',
+        )
+
+    def test_upload_not_decoded(self):
+        """Test the upload is streamed to disk and never decoded."""
+        with patch(
+            'django.core.files.uploadhandler.MemoryFileUploadHandler'
+            '.receive_data_chunk',
+        ) as in_memory, patch('PIL.ImageFile.ImageFile.load') as load:
+            res = self.upload(image_upload())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        in_memory.assert_not_called()
+        load.assert_not_called()
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_BYTES=100)
+    def test_image_too_large_error(self):
+        """Test an image above the size limit is rejected."""
+        res = self.upload(image_upload(size=(200, 200)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('larger than 100 bytes', str(res.data['image']))
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_BYTES=100)
+    def test_request_too_large_rejected_early(self):
+        """Test a body above the limit is rejected before it is read."""
+        content = b'\0' * 200 * 1024
+
+        with patch(
+            'recipe.uploads.ImageUploadHandler.receive_data_chunk',
+        ) as receive:
+            res = self.upload(SimpleUploadedFile('photo.jpg', content))
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        receive.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100)
+    def test_image_too_many_pixels_error(self):
+        """Test an image with too many pixels is rejected."""
+        res = self.upload(image_upload(size=(20, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('more than 100 pixels', str(res.data['image']))
+
+    def test_image_format_not_allowed_error(self):
+        """Test only the allowed image formats are accepted."""
+        for file in (
+            image_upload(image_format='GIF', name='photo.gif'),
+            SimpleUploadedFile('photo.jpg', b'not an image'),
+        ):
+            res = self.upload(file)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('valid image', str(res.data['image']))
+
+    @override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=True)
+    def test_same_upload_stored_once(self):
+        """Test the same photo uploaded to two recipes shares the file."""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Waffles',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        self.upload(image_upload())
+        self.client.post(
+            image_upload_url(other.id),
+            {'image': image_upload()},
+            format='multipart',
+        )
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertTrue(os.path.exists(other.image.path))
+
+    def test_replaced_image_deleted(self):
+        """Test the files of a replaced image are deleted on commit."""
+        self.upload(image_upload())
+        self.recipe.refresh_from_db()
+        old_image = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.upload(image_upload(size=(30, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(os.path.exists(old_image))
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
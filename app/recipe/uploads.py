@@ -0,0 +1,91 @@
+"""
+Bounded memory handling of the uploaded recipe images.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+
+# room for the multipart boundaries, headers and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(APIException):
+    """The request body is above the upload limit."""
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'The upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Stream the uploaded files to temporary files in chunks.
+
+    Nothing is kept in memory, whatever the size of the file. A request
+    announcing a body above the limit is rejected before it is read, a
+    file growing above it is not written any further and gets rejected
+    by its size in ValidatedImageField.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        limit = settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+        if content_length > limit:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        # the rest of an oversized file is read and dropped, the size the
+        # file reports stays the real one
+        if self.received <= settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES:
+            self.file.write(raw_data)
+
+
+class ValidatedImageField(serializers.ImageField):
+    """Image field validated from the header of the image only.
+
+    The size, format and dimensions are checked without decoding the
+    pixels, the image is decoded later by the rendition workers.
+    """
+    default_error_messages = {
+        'too_large': 'The image is larger than {max_size} bytes.',
+        'invalid_image': 'Upload a valid image, one of: {formats}.',
+        'too_many_pixels': 'The image has more than {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        # the checks of a file (name, empty), not the ones of an image
+        file = serializers.FileField.to_internal_value(self, data)
+
+        if file.size > settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES:
+            self.fail(
+                'too_large', max_size=settings.RECIPE_IMAGE_MAX_UPLOAD_BYTES,
+            )
+
+        formats = settings.RECIPE_IMAGE_FORMATS
+        try:
+            file.seek(0)
+            # only reads the header, the pixels are loaded on first use
+            with Image.open(file, formats=formats) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail(
+                'too_many_pixels', max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS,
+            )
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image', formats=', '.join(formats))
+
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels', max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS,
+            )
+
+        file.seek(0)
+        file.content_type = Image.MIME.get(image_format)
+        return file
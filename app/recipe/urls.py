@@ -29,4 +29,8 @@ app_name = 'recipe'
 urlpatterns = [
     # ex: 'api/recipe/'
     path('', include(router.urls)),
+    # ex: 'api/recipe/stats/'
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
+    # ex: 'api/recipe/media/uploads/recipe/<uuid>.jpg', the MEDIA_URL
+    path('media/<path:name>', views.RecipeMediaView.as_view(), name='media'),
 ]
@@ -1,34 +1,110 @@
 """
 Views for the recipe APIs.
 """
-from core.models import Ingredient, Recipe, Tag
+import json
+import os
+from itertools import islice
+
+from core.models import (
+    RECIPE_SEARCH_CONFIG,
+    Ingredient,
+    IngredientStats,
+    Recipe,
+    RenditionNames,
+    Tag,
+    TagStats,
+    UserRecipeStats,
+)
+from core.cleanup import delete_when_unused
+from core.signals import recipes_changed, user_data_changed
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+from django.utils import timezone
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
 )
+from rest_framework.views import APIView
 from rest_framework import (
     authentication,
+    filters,
     mixins,
     permissions,
     status,
     viewsets,
     )
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from recipe.bulk import BulkSelectionMixin, delete_by_ids
+from recipe.caching import CachedListMixin, ConditionalGetMixin
+from recipe.filters import RecipeOrderingFilter
+from recipe.image_cache import cached_name, open_resized
+from recipe.media import media_response
+from recipe.pagination import RecipeCursorPagination
+from recipe.renditions import pending_renditions, schedule_renditions
+from recipe.uploads import ImageUploadHandler
 from recipe.serializers import (
-    IngredientSerializer,
+    BulkResultSerializer,
+    BulkSelectionSerializer,
+    ImageResizeSerializer,
+    IngredientUsageSerializer,
+    RecipeBulkUpdateSerializer,
     RecipeDetailSerializer,
+    RecipeExportSerializer,
     RecipeImageSerializer,
+    RecipeReadSerializer,
     RecipeSerializer,
-    TagSerializer,
+    RecipeStatsSerializer,
+    RenameSerializer,
+    TagUsageSerializer,
+)
+
+
+# sparse fieldsets, shared by the list and the detail endpoint
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields',
+    OpenApiTypes.STR,
+    description=(
+        'Comma seperated list of the fields to return, e.g. id,title,price. '
+        'All the fields are returned by default.'
+    ),
 )
 
 
 @extend_schema_view(  # adding the cusom filtering atributes to our openAPI doc
     list=extend_schema(
+        # the list is serialized by RecipeReadSerializer, which returns
+        # the fields of RecipeSerializer without declaring them
+        responses=RecipeSerializer,
         parameters=[
+            FIELDS_PARAMETER,
             OpenApiParameter(
                 'tags',
                 OpenApiTypes.STR,
@@ -38,11 +114,40 @@ from recipe.serializers import (
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma seperated list of ingredient IDs to filter',
-            )
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description=(
+                    'any (default) returns recipes with at least one of the '
+                    'listed tags/ingredients, all returns recipes with every '
+                    'one of them.'
+                ),
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description=(
+                    'Full text search in the title, description, tags and '
+                    'ingredients, the best matches are returned first.'
+                ),
+            ),
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=[FIELDS_PARAMETER]),
+    create=extend_schema(
+        description=(
+            'Create a recipe, or many recipes at once when a list of '
+            'recipes is sent.'
+        ),
+    ),
 )  # this is used to update / customize the schema created by drf spectacular
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
+    BulkSelectionMixin,
+    viewsets.ModelViewSet,
+):
     """View for manage recipe APis."""
 
     serializer_class = RecipeDetailSerializer
@@ -54,31 +159,162 @@ class RecipeViewSet(viewsets.ModelViewSet):
     authentication_classes = [authentication.TokenAuthentication]
     # requires the user to be authenticated
     permission_classes = [permissions.IsAuthenticated]
+    # the list is paginated with a cursor, so the pages are read from
+    # the index by position and there is no OFFSET or COUNT(*)
+    pagination_class = RecipeCursorPagination
+    # supported sort keys (?ordering=id or ?ordering=-id), they have to be
+    # unique so the cursor can point to an exact position, search results
+    # are sorted by their rank
+    filter_backends = [RecipeOrderingFilter]
+    ordering_fields = ['id']
+    ordering = ['-id']
+    # the bulk actions can select the recipes like the list does
+    bulk_filter_params = ['tags', 'ingredients', 'search']
+
+    # model fields loaded from the recipe table, the others are either
+    # prefetched (tags, ingredients) or not selected when not requested
+    column_fields = {
+        'title', 'time_minutes', 'price', 'link', 'description', 'image',
+        'image_renditions', 'image_placeholder',
+    }
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Stream the uploaded images to temporary files."""
+        # before anything reads the body, the default handlers keep the
+        # smaller files in memory
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         "1,2,3 -> [1,2,3]"
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_by_related(self, queryset, through, field_name, ids,
+                           match_all):
+        """Filter recipes linked to the given ids through the m2m table."""
+        # the filtering is done on the m2m table alone (recipe_id, tag_id)
+        # so the recipe rows are never joined and never duplicated,
+        # and there is no need for a DISTINCT over the whole recipe rows
+        links = through.objects.filter(**{f'{field_name}__in': ids})
+        if match_all:
+            # one grouped query, only recipes linked to every single
+            # requested id have as many matching rows as there are ids
+            matching = links.values('recipe_id').annotate(
+                matched=Count(field_name),
+            ).filter(matched=len(set(ids))).values('recipe_id')
+            return queryset.filter(id__in=matching)
+
+        # semi join - WHERE EXISTS (SELECT 1 FROM ... WHERE recipe_id = id)
+        return queryset.filter(
+            Exists(links.filter(recipe_id=OuterRef('pk')))
+        )
+
+    def get_requested_fields(self):
+        """Return the fields requested with ?fields=, None for all."""
+        fields = self.request.query_params.get('fields')
+        # only the reads can be trimmed, writes always respond in full
+        if not fields or self.action not in ('list', 'retrieve', 'export'):
+            return None
+        requested = {field.strip() for field in fields.split(',')}
+        requested.discard('')
+        available = self.get_serializer_class().Meta.fields
+        unknown = requested - set(available)
+        if unknown:
+            raise ValidationError({
+                'fields': (
+                    f'Unknown fields: {", ".join(sorted(unknown))}. '
+                    f'Available fields: {", ".join(available)}.'
+                ),
+            })
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer limited to the requested fields."""
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        if self.action == 'create' and isinstance(kwargs.get('data'), list):
+            # a list of recipes is validated as a whole and then created
+            # with batched inserts by RecipeBulkCreateSerializer
+            kwargs.update(
+                many=True,
+                allow_empty=False,
+                max_length=settings.RECIPE_BULK_CREATE_MAX,
+            )
+        return super().get_serializer(*args, **kwargs)
+
     def get_queryset(self):
         """Retrive recipes for authenticated user."""
         # making sure the autheticatedd user gets only the recipes
         # that are connected to that user and no other recipes
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Has to be "any" or "all".'})
+        match_all = match == 'all'
+
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_by_related(
+                queryset, Recipe.tags.through, 'tag_id', tag_ids, match_all,
+            )
         if ingredients:
             ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            queryset = self._filter_by_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredients_ids,
+                match_all,
+            )
 
-        # we use the dictict key word to get uniqe list of values
-        # and not duplicates
-        return queryset.filter(
-            user=self.request.user
-            ).order_by('-id').distinct()
+        # annotations the ordering (and the cursor) depends on
+        annotations = []
+        search = self.request.query_params.get('search')
+        if search:
+            # matching against the stored and GIN indexed search vector,
+            # the query accepts the web search syntax ("quoted", or, -not)
+            query = SearchQuery(
+                search,
+                search_type='websearch',
+                config=RECIPE_SEARCH_CONFIG,
+            )
+            # the rank is cast to double precision so the value stored in
+            # the pagination cursor compares exactly on the next page
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+            )
+            annotations.append('rank')
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+
+        # the tags and ingredients are loaded for all the recipes at once
+        # (one query each), otherwise the serializer would run two extra
+        # queries for every single recipe
+        fields = self.get_requested_fields()
+        if self.action in ('list', 'export'):
+            # the list reads plain rows, RecipeReadSerializer loads the
+            # tags and ingredients of the whole page by itself
+            if fields is None:
+                fields = set(self.get_serializer_class().Meta.fields)
+            return queryset.values(
+                'id', *sorted(fields & self.column_fields), *annotations,
+            )
+        if self.action == 'image':
+            return queryset.only('id', 'image')
+        if fields is None:
+            return queryset.prefetch_related('tags', 'ingredients')
+
+        # only the requested columns are selected, and the m2m tables are
+        # not touched at all unless the tags or ingredients were requested
+        return queryset.only(
+            'id', *sorted(fields & self.column_fields),
+        ).prefetch_related(
+            *sorted(fields & {'tags', 'ingredients'}),
+        )
 
     # this will be used to change the serializer for a detail view
     # so there will be a different serializer for list view, adn detail view
@@ -87,17 +323,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # so if the action is list (get on main endpoint) -
         # listing all elements
         # the serializer will be change to the
-        # RecipeSerializer which is more general, and for any other action
-        # the default serializer will be used which is
+        # RecipeReadSerializer which returns the same fields as the more
+        # general RecipeSerializer straight from the database rows, and for
+        # any other action the default serializer will be used which is
         # the RecipeDetailSerializer
         if self.action == 'list':
-            return RecipeSerializer
+            return RecipeReadSerializer
         # upload image will be a custom action that will be defined as a
         # different method in our view Set, actions are basically ways that you
         # can add additional functionality on top of the viewSet default
         # funcionality that is created
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'export':
+            return RecipeExportSerializer
 
         return self.serializer_class
 
@@ -106,7 +345,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # we overide this method to save the current user from the request
         # to the recipe, to make sure that this user is asociated with the
         # recipe we are saving
-        serializer.save(user=self.request.user)
+        if isinstance(serializer.validated_data, list) or not (
+            serializer.validated_data.get('image')
+        ):
+            serializer.save(user=self.request.user)
+            return
+        recipe = serializer.save(
+            user=self.request.user,
+            image_renditions=pending_renditions(),
+        )
+        schedule_renditions(recipe)
+
+    def perform_update(self, serializer):
+        """Update a recipe, new images get their renditions generated."""
+        if 'image' not in serializer.validated_data:
+            serializer.save()
+            return
+        # the files of the replaced image, deleted once the new one is
+        # committed
+        replaced = [
+            serializer.instance.image.name,
+            *serializer.instance.image_renditions.values(),
+        ]
+        # the resized copies are made by the workers after the response,
+        # until then they are reported as pending
+        image = serializer.validated_data['image']
+        # the placeholder of the old image goes too, the new one is
+        # generated with the renditions
+        recipe = serializer.save(
+            image_renditions=pending_renditions() if image else {},
+            image_placeholder='',
+            image_renditions_failed=False,
+        )
+        schedule_renditions(recipe)
+        delete_when_unused(replaced)
 
     # creating the custom action
     @action(methods=['POST'], detail=True, url_path='upload-image')
@@ -116,11 +388,151 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[ImageResizeSerializer],
+        responses={
+            (200, 'image/webp'): OpenApiTypes.BINARY,
+            (200, 'image/jpeg'): OpenApiTypes.BINARY,
+        },
+        description=(
+            'Download the image of the recipe resized to one of the '
+            'supported widths, the aspect ratio is kept and images are '
+            'never enlarged.'
+        ),
+    )
+    @action(methods=['GET'], detail=True, url_path='image')
+    def image(self, request, pk=None):
+        """Return the image of the recipe resized."""
+        params = ImageResizeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        width = params.validated_data['width']
+        output = params.validated_data['output']
+        recipe = self.get_object()
+        if not recipe.image:
+            raise NotFound('The recipe has no image.')
+
+        # the cached file is named after the original, a new image of the
+        # recipe gets a new ETag
+        etag = quote_etag(cached_name(recipe.image.name, width, output))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                file = open_resized(recipe.image.name, width, output)
+            except OSError:
+                raise NotFound('The image of the recipe cannot be read.')
+            response = media_response(
+                os.path.relpath(file.name, settings.MEDIA_ROOT),
+                file=file,
+                content_type=f'image/{output}',
+            )
+        response.headers['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @extend_schema(
+        parameters=[FIELDS_PARAMETER],
+        responses={(200, 'application/x-ndjson'): RecipeDetailSerializer},
+        description=(
+            'Download all the recipes as newline delimited JSON, one recipe '
+            'per line. The filters of the list can be used too.'
+        ),
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all the recipes of the user as NDJSON."""
+        serializer = self.get_serializer()
+        chunk_size = settings.RECIPE_EXPORT_CHUNK_SIZE
+        # read with a server side cursor, chunk by chunk, so only one
+        # chunk of recipes is ever held in memory
+        rows = self.get_queryset().iterator(chunk_size=chunk_size)
+
+        def lines():
+            while chunk := list(islice(rows, chunk_size)):
+                # the tags and ingredients of the chunk, one query each
+                yield ''.join(
+                    json.dumps(item) + '\n'
+                    for item in serializer.to_representation_many(chunk)
+                )
+
+        response = StreamingHttpResponse(
+            lines(),
+            content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"'
+        )
+        return response
+
+    @extend_schema(
+        request=RecipeBulkUpdateSerializer,
+        responses=BulkResultSerializer,
+        description=(
+            'Update many recipes at once. The recipes are selected by the '
+            '"ids" in the body and/or the filters of the list (tags, '
+            'ingredients, search).'
+        ),
+    )
+    @action(methods=['PATCH'], detail=False, url_path='bulk')
+    def bulk_update(self, request):
+        """Update the selected recipes with the same values."""
+        serializer = RecipeBulkUpdateSerializer(
+            data=request.data,
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.validated_data
+
+        with transaction.atomic():
+            recipes = Recipe.objects.filter(pk__in=self.get_bulk_ids(request))
+            # update() does not set auto_now fields and sends no signals
+            updated = recipes.update(updated_at=timezone.now(), **changes)
+            if {'title', 'description'} & set(changes):
+                recipes.update_search_vector()
+            if updated:
+                user_data_changed(request.user.pk)
+
+        return Response({'updated': updated})
+
+    @extend_schema(
+        request=BulkSelectionSerializer,
+        responses=BulkResultSerializer,
+        description=(
+            'Delete many recipes at once. The recipes are selected by the '
+            '"ids" in the body and/or the filters of the list (tags, '
+            'ingredients, search).'
+        ),
+    )
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete the selected recipes."""
+        with transaction.atomic():
+            recipe_ids = self.get_bulk_ids(request)
+            # no delete signals are sent, the image files are collected
+            # here
+            files = []
+            for image, renditions in Recipe.objects.filter(
+                pk__in=recipe_ids,
+            ).exclude(image='').exclude(image=None).values_list(
+                'image', 'image_renditions',
+            ):
+                files += [image, *renditions.values()]
+            for through in (Recipe.tags.through, Recipe.ingredients.through):
+                through.objects.filter(recipe_id__in=recipe_ids).delete()
+            # a plain DELETE statement, delete() would load every recipe
+            # to send the delete signals for it
+            deleted = delete_by_ids(Recipe, recipe_ids)
+            delete_when_unused(files)
+            if deleted:
+                user_data_changed(request.user.pk)
+
+        return Response({'deleted': deleted})
+
 
 # creating one class taht canbe  used as based
 # so other can simply inherit from it
@@ -131,11 +543,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],  # takes only 0 or 1
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description=(
+                    'Fuzzy lookup by name, tolerates typos, the closest '
+                    'matches are returned first.'
+                ),
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+                            CachedListMixin,
+                            BulkSelectionMixin,
                             mixins.UpdateModelMixin,
                             mixins.DestroyModelMixin,
                             mixins.ListModelMixin,
@@ -144,6 +566,11 @@ class BaseRecipeAttrViewSet(
     """Base viewset for recipe atributes."""
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    bulk_filter_params = ['assigned_only', 'q']
+    # ?ordering=-recipe_count lists the most used first, without it the
+    # order of get_queryset() is kept
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['name', 'recipe_count']
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -154,22 +581,227 @@ class BaseRecipeAttrViewSet(
         )
         queryset = self.queryset
         if assigned_only:
-            # so we are filtering by including all that have recipe not
-            # equel null which means, there are recipies asociated with it
-            queryset = queryset.filter(recipe__isnull=False)
+            # the number of recipes is kept on the row itself, so no join
+            # with the recipes (and no DISTINCT) is needed
+            queryset = queryset.filter(recipe_count__gt=0)
+
+        ordering = ['-name']
+        q = self.request.query_params.get('q')
+        if q:
+            # word similarity (name %> q) matches the query against the
+            # words of the name, so "chese" finds "Parmesan cheese", the
+            # operator is served by the trigram index on (user, name),
+            # the matches are then ranked by how close the whole name is
+            queryset = queryset.filter(name__trigram_word_similar=q).annotate(
+                similarity=TrigramSimilarity('name', q),
+            )
+            ordering = ['-similarity', '-name']
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('-name').distinct()
+            ).order_by(*ordering)
+
+    def perform_update(self, serializer):
+        """Update the name, unless the user already uses it."""
+        # the unique (user, name) constraint decides, so two concurrent
+        # renames to the same name cannot both succeed
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': 'You already have one with this name.'}
+            )
+
+    def _recipe_ids(self, ids):
+        """Return the ids of the recipes using the given objects, the ids
+        have to belong to the user already."""
+        model = self.queryset.model
+        return list(
+            model.recipe_set.through.objects.filter(
+                **{f'{model._meta.model_name}_id__in': ids}
+            ).values_list('recipe_id', flat=True).distinct()
+        )
+
+    @extend_schema(
+        request=RenameSerializer(many=True),
+        responses=BulkResultSerializer,
+        description='Rename many of them at once.',
+    )
+    @action(methods=['PATCH'], detail=False, url_path='bulk')
+    def bulk_update(self, request):
+        """Rename the listed objects with one statement."""
+        serializer = RenameSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+        )
+        serializer.is_valid(raise_exception=True)
+        names = {
+            item['id']: item['name'] for item in serializer.validated_data
+        }
+
+        # the ids of other users are left out, their recipes too
+        owned = self.queryset.filter(user=request.user, pk__in=names)
+        try:
+            with transaction.atomic():
+                # UPDATE ... SET name = CASE WHEN id = 1 THEN 'a' ... END
+                updated = owned.update(name=Case(
+                    *[When(pk=pk, then=Value(name))
+                      for pk, name in names.items()],
+                    default=F('name'),
+                ))
+                if updated:
+                    recipes_changed(self._recipe_ids(owned.values('pk')))
+                    user_data_changed(request.user.pk)
+        except IntegrityError:
+            raise ValidationError(
+                {'name': 'You already have one with this name.'}
+            )
+
+        return Response({'updated': updated})
+
+    @extend_schema(
+        request=BulkSelectionSerializer,
+        responses=BulkResultSerializer,
+        description=(
+            'Delete many of them at once. They are selected by the "ids" '
+            'in the body and/or the filters of the list (assigned_only, q).'
+        ),
+    )
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete the selected objects."""
+        model = self.queryset.model
+        with transaction.atomic():
+            ids = self.get_bulk_ids(request)
+            recipe_ids = self._recipe_ids(ids)
+            model.recipe_set.through.objects.filter(
+                **{f'{model._meta.model_name}_id__in': ids}
+            ).delete()
+            # a plain DELETE statement, delete() would load every object
+            # to send the delete signals for it
+            deleted = delete_by_ids(model, ids)
+            recipes_changed(recipe_ids)
+            if deleted:
+                user_data_changed(request.user.pk)
+
+        return Response({'deleted': deleted})
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database."""
-    serializer_class = TagSerializer
+    serializer_class = TagUsageSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
-    serializer_class = IngredientSerializer
+    serializer_class = IngredientUsageSerializer
     queryset = Ingredient.objects.all()
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Number of the most used tags and ingredients '
+                            '(default 10, between 0 and 100).',
+            ),
+        ],
+        responses=RecipeStatsSerializer,
+    )
+)
+class RecipeStatsView(APIView):
+    """Recipe statistics of the authenticated user.
+
+    The statistics come from materialized views refreshed periodically by
+    the refresh_recipe_stats command, so every request is three index
+    lookups no matter how many recipes the user has.
+    """
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """Return the statistics."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = -1
+        if not 0 <= limit <= 100:
+            raise ValidationError({'limit': 'Has to be between 0 and 100.'})
+
+        stats = UserRecipeStats.objects.filter(user=request.user).first()
+        tags = TagStats.objects.filter(
+            user=request.user,
+        ).order_by('-recipe_count', 'tag')[:limit]
+        ingredients = IngredientStats.objects.filter(
+            user=request.user,
+        ).order_by('-recipe_count', 'ingredient')[:limit]
+
+        serializer = RecipeStatsSerializer({
+            'recipe_count': stats.recipe_count if stats else 0,
+            'time_minutes': {
+                'avg': stats and stats.avg_time_minutes,
+                'median': stats and stats.median_time_minutes,
+            },
+            'price': {
+                'avg': stats and stats.avg_price,
+                'median': stats and stats.median_price,
+            },
+            'tags': tags,
+            'ingredients': ingredients,
+            'refreshed_at': stats and stats.refreshed_at,
+        })
+        return Response(serializer.data)
+
+
+class RecipeMediaView(APIView):
+    """Send the recipe images and their renditions to their owners.
+
+    MEDIA_URL points here, the stored files are only reachable through
+    this view, nginx sends them once the owner was checked.
+    """
+    authentication_classes = [
+        authentication.TokenAuthentication,
+        # the links of the images in the admin
+        authentication.SessionAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        responses={(200, 'image/*'): OpenApiTypes.BINARY},
+        description=(
+            'Download a recipe image or one of its renditions, the URLs '
+            'are in the recipe responses.'
+        ),
+    )
+    def get(self, request, name):
+        """Return the file if a recipe of the user uses it."""
+        recipes = Recipe.objects.all()
+        if not request.user.is_staff:
+            recipes = recipes.filter(user=request.user)
+        # the file is the image or one of the renditions of the recipe,
+        # the names come from the database, never from the path alone
+        used = recipes.alias(
+            rendition_names=RenditionNames('image_renditions'),
+        ).filter(
+            Q(image=name) | Q(rendition_names__contains=[name])
+        ).exists()
+        if not used:
+            raise NotFound()
+
+        try:
+            response = media_response(name)
+        except FileNotFoundError:
+            raise NotFound()
+        # the names are unique (uuid or hash of the content), a name is
+        # never used for another file
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        patch_cache_control(
+            response, private=True, max_age=365 * 24 * 60 * 60,
+            immutable=True,
+        )
+        return response
@@ -1,6 +1,7 @@
 """
 Tests for the user API.
 """
+from core.tests.utils import query_budget
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -49,6 +50,19 @@ class PublicUserApiTest(TestCase):
         # if it was than it is a security issue!
         self.assertNotIn('password', res.data)
 
+    def test_create_user_query_budget(self):
+        """Test creating a user stays within its query budget."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'asdfghjkl;weq',
+            'name': 'Test Name',
+        }
+        # the unique email check and the insert
+        with query_budget(2):
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
     def test_user_with_email_exists_error(self):
         """Test error returned if user with email exists."""
         payload = {
@@ -182,3 +196,13 @@ class PrivateUserApiTest(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_user_profile_query_budget(self):
+        """Test updating the profile stays within its query budget."""
+        payload = {'name': 'Updated Name', 'password': 'newpassword12412'}
+
+        # saving the new name and saving the hashed password
+        with query_budget(2):
+            res = self.client.patch(ME_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,8 +1,21 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /static {
-        alias /vol/static;
+    # the collected static files (STATIC_URL and STATIC_ROOT of the app),
+    # the rest of the volume holds the media files, not public
+    location /static/static/ {
+        alias /vol/static/media/;
+    }
+
+    # the media files (MEDIA_ROOT of the app), never requested directly,
+    # the app checks the owner and answers with X-Accel-Redirect to here
+    location /protected-media/ {
+        internal;
+        alias /vol/static/static/;
+        sendfile   on;
+        tcp_nopush on;
+        # the Cache-Control of the app response is kept, the names of the
+        # files never change their content
     }
 
     location / {
@@ -0,0 +1,20 @@
+#!/bin/sh
+
+set -e
+
+python manage.py wait_for_db
+
+# the periodic maintenance of the app, a failed run is retried on the next
+# round instead of stopping the loop
+round=0
+while true; do
+    python manage.py refresh_recipe_stats || echo "refresh_recipe_stats failed"
+    # the renditions lost by the workers are looked for less often, every
+    # RENDITIONS_ROUNDS rounds (an hour by default)
+    if [ $((round % ${RENDITIONS_ROUNDS:-12})) -eq 0 ]; then
+        python manage.py generate_image_renditions \
+            || echo "generate_image_renditions failed"
+    fi
+    round=$((round + 1))
+    sleep "${RECIPE_STATS_REFRESH_SECONDS:-300}"
+done